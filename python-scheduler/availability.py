@@ -0,0 +1,169 @@
+import logging
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+from pytz import UTC
+from interval_index import to_utc
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+# The Node weekly grid (AvailabilityManager.jsx) stores start-only cells such as '9:00 AM'
+SLOT_CELL_MINUTES = 30
+
+logger = logging.getLogger(__name__)
+
+
+def to_minutes(value):
+    """Whole minutes since the Unix epoch for a datetime or ISO string."""
+    return int((to_utc(value) - EPOCH).total_seconds() // 60)
+
+
+def from_minutes(minutes):
+    return EPOCH + timedelta(minutes=int(minutes))
+
+
+def parse_clock(text):
+    """Minutes after midnight for a clock string such as '9:00 AM' (or 24-hour '09:00')."""
+    text = text.strip().upper()
+    period = text[-2:]
+    if period in ('AM', 'PM'):
+        text = text[:-2].strip()
+    hour, minute = text.split(':')
+    hour = int(hour)
+    if period == 'PM' and hour != 12:
+        hour += 12
+    if period == 'AM' and hour == 12:
+        hour = 0
+    return hour * 60 + int(minute)
+
+
+def parse_slot_minutes(slot):
+    """Parse '9:00 AM-11:00 AM' (spaces around the dash allowed) into minutes after midnight.
+
+    A start-only slot such as '9:00 AM' is one SLOT_CELL_MINUTES cell of the weekly grid.
+    """
+    if '-' not in slot:
+        start = parse_clock(slot)
+        return start, start + SLOT_CELL_MINUTES
+    start_str, end_str = slot.split('-')
+    return parse_clock(start_str), parse_clock(end_str)
+
+
+class CompiledAvailability:
+    """Merged availability windows of one document as epoch-minute (start, end) pairs."""
+
+    __slots__ = ('windows', '_starts')
+
+    def __init__(self, windows):
+        self.windows = windows
+        self._starts = {}
+
+    def slot_starts(self, duration):
+        """Sorted start minutes of every duration-long slot, computed once per duration."""
+        starts = self._starts.get(duration)
+        if starts is None:
+            starts = array('q')
+            for start, end in self.windows:
+                starts.extend(range(start, end - duration + 1, duration))
+            self._starts[duration] = starts
+        return starts
+
+
+def _day_slots(doc):
+    """Yield (date, slot strings) for both the per-date and the weekStart/timeSlots document shapes."""
+    if 'timeSlots' in doc:
+        week_start = to_utc(doc['weekStart']).date()
+        for day, slots in (doc.get('timeSlots') or {}).items():
+            if day in WEEKDAYS and slots:
+                offset = (WEEKDAYS.index(day) - week_start.weekday()) % 7
+                yield week_start + timedelta(days=offset), slots
+    elif doc.get('date') is not None:
+        yield to_utc(doc['date']).date(), doc.get('availableSlots') or []
+
+
+def compile_document(doc):
+    windows = []
+    for day, slots in _day_slots(doc):
+        day_start = to_minutes(UTC.localize(datetime.combine(day, time.min)))
+        for slot in slots:
+            try:
+                start, end = parse_slot_minutes(slot)
+            except (AttributeError, TypeError, ValueError):
+                logger.warning(f"Skipping malformed availability slot {slot!r} (document: {doc.get('_id')})")
+                continue
+            if end > start:
+                windows.append((day_start + start, day_start + end))
+    windows.sort()
+    merged = []
+    for start, end in windows:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return CompiledAvailability(merged)
+
+
+class AvailabilityCache:
+    """Thread-safe LRU of compiled availability documents."""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(doc):
+        # The Node service upserts timeSlots without touching any timestamp, so documents
+        # without updatedAt are keyed on their raw slot strings instead.
+        if doc.get('updatedAt') is not None:
+            version = doc['updatedAt']
+        elif 'timeSlots' in doc:
+            version = tuple((day, tuple(slots)) for day, slots in sorted((doc.get('timeSlots') or {}).items()))
+        else:
+            version = (doc.get('date'), tuple(doc.get('availableSlots') or ()))
+        return str(doc['examinerId']), doc.get('module'), str(doc.get('_id')), version
+
+    def get(self, doc):
+        key = self.key(doc)
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                return compiled
+        compiled = compile_document(doc)
+        with self._lock:
+            self._entries[key] = compiled
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = AvailabilityCache()
+
+
+def examiner_slot_starts(docs, duration, window_start, window_end):
+    """Map each examiner to the sorted epoch-minute slot starts that fit inside the event window."""
+    parts = {}
+    for doc in docs:
+        starts = cache.get(doc).slot_starts(duration)
+        lo = bisect_left(starts, window_start)
+        hi = bisect_right(starts, window_end - duration)
+        if lo < hi:
+            parts.setdefault(str(doc['examinerId']), []).append(starts[lo:hi])
+    slots_by_examiner = {}
+    for examiner_id, examiner_parts in parts.items():
+        if len(examiner_parts) == 1:
+            slots_by_examiner[examiner_id] = examiner_parts[0]
+        else:
+            merged = set()
+            for part in examiner_parts:
+                merged.update(part)
+            slots_by_examiner[examiner_id] = array('q', sorted(merged))
+    return slots_by_examiner
@@ -0,0 +1,102 @@
+import os
+from interval_index import BusyIndex
+from resources import PerProcess
+from solver import greedy_solver, solve_optimal
+
+# Worker processes for solving independent components; 0 or 1 solves everything in process.
+# Each gunicorn worker starts its own pool on its first batch request, so a host can hold up
+# to SCHEDULER_WORKERS * BATCH_PROCESSES solver processes; keep the product near the core count.
+BATCH_PROCESSES = int(os.getenv('BATCH_PROCESSES', 2))
+
+
+
+class _Components:
+    """Union-find over event positions."""
+
+    def __init__(self, size):
+        self._parent = list(range(size))
+
+    def find(self, i):
+        parent = self._parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, a, b):
+        self._parent[self.find(a)] = self.find(b)
+
+
+def connected_components(events):
+    """Group events that share an examiner or a student, keeping request order in each group.
+
+    events is a list of (examiner_ids, student_ids) pairs; returns lists of event positions.
+    """
+    components = _Components(len(events))
+    first_seen = {}
+    for position, (examiner_ids, student_ids) in enumerate(events):
+        owners = [('examiner', id) for id in examiner_ids] + [('student', id) for id in student_ids]
+        for owner in owners:
+            seen = first_seen.setdefault(owner, position)
+            if seen != position:
+                components.union(seen, position)
+    groups = {}
+    for position in range(len(events)):
+        groups.setdefault(components.find(position), []).append(position)
+    return list(groups.values())
+
+
+def solve_component(tasks, schedules):
+    """Solve one component's events in order against one busy index built from schedules.
+
+    Each task is a dict with student_ids, slots_by_examiner, duration, strategy and backend.
+    Placements of earlier events are busy time for later ones. Returns one (placements,
+    unplaced, error) tuple per task; a greedy event that cannot be completed places nobody
+    and reports the student it stopped at as error.
+    """
+    busy_index = BusyIndex.from_schedules(schedules)
+    results = []
+    for task in tasks:
+        student_ids, duration = task['student_ids'], task['duration']
+        if not student_ids:
+            results.append(([], [], 'No students registered for this module'))
+            continue
+        if not task['slots_by_examiner']:
+            results.append(([], [], 'No examiner availability within event dates'))
+            continue
+        if task['strategy'] == 'optimal':
+            placements, unplaced = solve_optimal(student_ids, task['slots_by_examiner'], duration, busy_index)
+            for student_id, examiner_id, start, end in placements:
+                busy_index.add(examiner_id, student_id, start, end)
+            results.append((placements, unplaced, None))
+            continue
+        placements, unplaced = greedy_solver(task['backend'])(student_ids, task['slots_by_examiner'], duration, busy_index)
+        if unplaced:
+            # All or nothing, as for POST /schedule: free the time this event had taken
+            for student_id, examiner_id, start, _ in placements:
+                busy_index.examiners.remove(examiner_id, start, None)
+                busy_index.students.remove(student_id, start, None)
+            results.append(([], [], f'No conflict-free slot for student {unplaced[0]}'))
+        else:
+            results.append((placements, [], None))
+    return results
+
+
+def _new_pool():
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # spawn, not fork: the web server's threads and connections must not leak into workers
+    return ProcessPoolExecutor(max_workers=BATCH_PROCESSES, mp_context=multiprocessing.get_context('spawn'))
+
+
+_pool = PerProcess(_new_pool)
+
+
+def solve_components(work):
+    """Solve [(tasks, schedules), ...] components, spread over the process pool when there are several."""
+    if len(work) < 2 or BATCH_PROCESSES < 2:
+        return [solve_component(tasks, schedules) for tasks, schedules in work]
+    pool = _pool.get()
+    futures = [pool.submit(solve_component, tasks, schedules) for tasks, schedules in work]
+    return [future.result() for future in futures]
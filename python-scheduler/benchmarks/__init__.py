@@ -0,0 +1 @@
+"""Synthetic datasets and phase timings for the scheduling endpoints; see benchmarks/run.py."""
@@ -0,0 +1,82 @@
+"""Synthetic module data in the shapes the scheduler reads: users, moduleregistrations,
+examineravailabilities and pre-existing schedules."""
+import math
+import random
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from pytz import UTC
+
+WINDOW_START = datetime(2030, 1, 7, tzinfo=UTC)
+MODULE = 'BENCH1001'
+DAILY_SLOTS = ['9:00 AM-12:00 PM', '1:00 PM-5:00 PM']
+# Slots per examiner per day for DAILY_SLOTS at the given duration
+_DAILY_MINUTES = (3 + 4) * 60
+INSERT_BATCH_SIZE = 10000
+
+
+def examiners_needed(students, days, duration=30, existing=0, headroom=1.25):
+    """Enough examiners for every student to fit around the existing schedules, with some slack.
+
+    Each existing schedule can take up one examiner slot, so they count like students.
+    """
+    per_examiner = days * (_DAILY_MINUTES // duration)
+    return max(1, math.ceil((students + existing) * headroom / per_examiner))
+
+
+def generate(students, examiners=None, days=10, existing=0, duration=30, module=MODULE, seed=0):
+    """Build the documents for one module; nothing is written to a database.
+
+    existing schedules belong to other modules but use the same examiners and students,
+    so they show up in the busy index exactly like real clashes would.
+    """
+    rng = random.Random(seed)
+    examiners = examiners or examiners_needed(students, days, duration, existing)
+    student_ids = [ObjectId() for _ in range(students)]
+    examiner_ids = [ObjectId() for _ in range(examiners)]
+
+    users = (
+        [{'_id': id, 'role': 'Student', 'email': f'student{i}@example.com'} for i, id in enumerate(student_ids)]
+        + [{'_id': id, 'role': 'Examiner', 'email': f'examiner{i}@example.com'} for i, id in enumerate(examiner_ids)]
+    )
+    registrations = [{'studentId': id, 'moduleCode': module} for id in student_ids]
+    availabilities = [{
+        'examinerId': examiner_id,
+        'module': module,
+        'date': (WINDOW_START + timedelta(days=day)).replace(tzinfo=None),
+        'availableSlots': list(DAILY_SLOTS),
+        'updatedAt': WINDOW_START.replace(tzinfo=None)
+    } for examiner_id in examiner_ids for day in range(days)]
+
+    schedules = []
+    for i in range(existing):
+        start = WINDOW_START + timedelta(days=rng.randrange(days), hours=9, minutes=duration * rng.randrange(14))
+        schedules.append({
+            'examinerId': rng.choice(examiner_ids),
+            'studentId': rng.choice(student_ids),
+            'startTime': start,
+            'endTime': start + timedelta(minutes=duration),
+            'googleMeetLink': f'https://meet.google.com/existing-{i + 1}',
+            'module': f'{module}-OTHER',
+            'eventId': 'benchmark-existing'
+        })
+
+    return {
+        'module': module,
+        'startDate': WINDOW_START,
+        'endDate': WINDOW_START + timedelta(days=days),
+        'duration': duration,
+        'studentIds': [str(id) for id in student_ids],
+        'examinerIds': [str(id) for id in examiner_ids],
+        'users': users,
+        'moduleregistrations': registrations,
+        'examineravailabilities': availabilities,
+        'schedules': schedules
+    }
+
+
+def load(db, dataset):
+    """Insert the generated documents into db in batches."""
+    for name in ('users', 'moduleregistrations', 'examineravailabilities', 'schedules'):
+        docs = dataset[name]
+        for i in range(0, len(docs), INSERT_BATCH_SIZE):
+            db[name].insert_many(docs[i:i + INSERT_BATCH_SIZE], ordered=False)
@@ -0,0 +1,222 @@
+"""Time the scheduling phases on synthetic data and print the results as JSON.
+
+Each scale gets a fresh database with N students, D days of availability, K pre-existing
+schedules and enough examiners for the students to fit around them (or --examiners). A run
+that cannot place every student stops with an error. The phases of POST /schedule are timed
+separately - loading, placement, conflict checking, inserting and notification (through an
+in-memory mail transport) - followed by a round of PUT /reschedule requests.
+
+In process with mongomock (the default). mongomock scans collections for $lookup and updates,
+so its load and notification timings grow much faster than a real server's; use it for the
+placement and conflict-checking phases and for smoke runs:
+
+    python benchmarks/run.py --scales 1000,10000
+
+Against a local mongod; every scale drops and reseeds the database:
+
+    python benchmarks/run.py --mongo-uri mongodb://localhost:27017/edutimesync_bench --scales 1000,10000,100000
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson.objectid import ObjectId
+
+import availability
+import scheduler
+from availability import examiner_slot_starts, to_minutes
+from benchmarks.dataset import generate, load
+from dispatch import EmailDispatcher, MemoryTransport, smtp_settings
+from loaders import ensure_indexes, load_availabilities, load_busy_index, load_examiner_emails, load_registered_students
+from reservations import ensure_reservation_indexes
+from resources import get_dispatcher, set_dispatcher
+from solver import greedy_solver, solve_optimal
+
+
+class Timer:
+    def __init__(self):
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round((time.perf_counter() - started) * 1000, 2)
+
+
+def connect(mongo_uri):
+    if mongo_uri:
+        from pymongo import MongoClient
+
+        db = MongoClient(mongo_uri).get_default_database()
+        db.client.drop_database(db.name)
+        return db
+    import mongomock
+
+    return mongomock.MongoClient().get_database('benchmark')
+
+
+def solver_for(strategy, backend):
+    if strategy == 'optimal':
+        return solve_optimal
+    return greedy_solver(backend)
+
+
+def run_scale(args, students):
+    db = connect(args.mongo_uri)
+    dataset = generate(students, args.examiners, args.days, args.existing, args.duration, seed=args.seed)
+    started = time.perf_counter()
+    load(db, dataset)
+    ensure_indexes(db)
+    ensure_reservation_indexes(db)
+    seed_s = time.perf_counter() - started
+
+    availability.cache.clear()
+    # The real dispatcher - queueing, MIME building, status records - minus the SMTP server
+    dispatcher = EmailDispatcher(MemoryTransport(), smtp_settings()['from_email'],
+                                 deliveries=lambda: db.emaildeliveries, workers=args.email_workers)
+    set_dispatcher(dispatcher)
+    scheduler.set_db(db)
+    timer = Timer()
+    start_date, end_date, duration = dataset['startDate'], dataset['endDate'], dataset['duration']
+    examiner_ids_obj = [ObjectId(id) for id in dataset['examinerIds']]
+
+    with timer.phase('load_students'):
+        student_ids, student_emails = load_registered_students(db, dataset['module'])
+    with timer.phase('load_availability'):
+        docs = load_availabilities(db, examiner_ids_obj, dataset['module'], start_date, end_date)
+        examiner_emails = load_examiner_emails(db, examiner_ids_obj)
+        slots_by_examiner = examiner_slot_starts(docs, duration, to_minutes(start_date), to_minutes(end_date))
+    with timer.phase('load_busy'):
+        busy_index = load_busy_index(db, examiner_ids_obj, [ObjectId(id) for id in student_ids], start_date, end_date)
+    with timer.phase('placement'):
+        placements, unplaced = solver_for(args.strategy, args.backend)(
+            student_ids, slots_by_examiner, duration, busy_index
+        )
+    if unplaced:
+        # The later phases would only time a truncated run
+        raise SystemExit(
+            f'{students} students: placed {len(placements)}, could not place {len(unplaced)}; '
+            f'raise --examiners or --days, or lower --existing'
+        )
+
+    # Conflict checks as reschedule makes them, against the busy index after placement
+    rng = random.Random(args.seed)
+    probes = []
+    for _ in range(args.conflict_checks):
+        start = start_date + timedelta(days=rng.randrange(args.days), hours=9, minutes=duration * rng.randrange(14))
+        probes.append((start, start + timedelta(minutes=duration),
+                       rng.choice(dataset['examinerIds']), rng.choice(student_ids)))
+    with timer.phase('conflict_check'):
+        conflicts = sum(busy_index.has_conflict(*probe) for probe in probes)
+
+    params = {'module': dataset['module'], 'eventId': 'benchmark'}
+    with timer.phase('insert'):
+        schedules = scheduler.build_schedules(params, placements)
+        if schedules:
+            result = db.schedules.insert_many(schedules)
+            for schedule, schedule_id in zip(schedules, result.inserted_ids):
+                schedule['_id'] = str(schedule_id)
+    with timer.phase('notify_submit'):
+        summary = scheduler.notify_placed(schedules, student_emails, examiner_emails)
+    with timer.phase('notify_send'):
+        dispatcher.flush()
+    dispatcher.shutdown()
+
+    return {
+        'students': students,
+        'examiners': len(dataset['examinerIds']),
+        'days': args.days,
+        'existing_schedules': args.existing,
+        'strategy': args.strategy,
+        'backend': args.backend,
+        'database': 'mongod' if args.mongo_uri else 'mongomock',
+        'seed_s': round(seed_s, 3),
+        'placed': len(placements),
+        'unplaced': len(unplaced),
+        'conflict_checks': args.conflict_checks,
+        'conflicts_found': conflicts,
+        'notifications': summary['queued'],
+        'phases_ms': timer.phases,
+        'total_ms': round(sum(timer.phases.values()), 2),
+        'reschedule': run_reschedules(args, schedules, start_date)
+    }
+
+
+def run_reschedules(args, schedules, start_date):
+    """Send --reschedules PUT /reschedule requests through the Flask test client."""
+    if not schedules or not args.reschedules:
+        return None
+    client = scheduler.create_app().test_client()
+    rng = random.Random(args.seed)
+    latencies = []
+    statuses = {}
+    for _ in range(args.reschedules):
+        schedule = rng.choice(schedules)
+        start = start_date + timedelta(days=rng.randrange(args.days), hours=9,
+                                       minutes=args.duration * rng.randrange(14))
+        body = {'proposedTime': start.isoformat(), 'examinerId': str(schedule['examinerId']),
+                'studentId': str(schedule['studentId'])}
+        started = time.perf_counter()
+        status = client.put(f"/reschedule/{schedule['_id']}", json=body).status_code
+        latencies.append((time.perf_counter() - started) * 1000)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    get_dispatcher().flush()
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': args.reschedules,
+        'status': statuses,
+        'latency_ms': {
+            'p50': round(cuts[49], 2),
+            'p90': round(cuts[89], 2),
+            'p99': round(cuts[98], 2),
+            'max': round(max(latencies), 2),
+            'mean': round(statistics.mean(latencies), 2)
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='1000,10000,100000', help='comma-separated student counts')
+    parser.add_argument('--examiners', type=int, default=None, help='default: enough for every student to fit around the existing schedules')
+    parser.add_argument('--days', type=int, default=10)
+    parser.add_argument('--existing', type=int, default=1000, help='pre-existing schedules in other modules')
+    parser.add_argument('--duration', type=int, default=30)
+    parser.add_argument('--strategy', choices=('greedy', 'optimal'), default='optimal')
+    parser.add_argument('--backend', choices=('python', 'numpy'), default='python')
+    parser.add_argument('--conflict-checks', type=int, default=10000)
+    parser.add_argument('--reschedules', type=int, default=200)
+    parser.add_argument('--email-workers', type=int, default=3)
+    parser.add_argument('--mongo-uri', help='benchmark against this database instead of mongomock (it is dropped)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='also write the JSON results to this file')
+    args = parser.parse_args()
+
+    # Per-request logs would dominate the timings; rejected reschedules are counted in 'status'
+    logging.disable(logging.ERROR)
+    results = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': sys.version.split()[0],
+        'runs': [run_scale(args, int(scale)) for scale in args.scales.split(',')]
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
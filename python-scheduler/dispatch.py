@@ -0,0 +1,238 @@
+import logging
+import os
+import queue
+import threading
+from bson.objectid import ObjectId
+from notifications import build_message
+from resources import PerProcess, now
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class _Workers:
+    """A process's delivery queue and the threads draining it."""
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.threads = []
+
+
+def smtp_settings():
+    """SMTP settings from the environment, e.g. EMAIL_PROVIDER='sendgrid', 'outlook', 'zoho' or 'custom'."""
+    provider = os.getenv('EMAIL_PROVIDER', 'sendgrid')
+    return {
+        'provider': provider,
+        'host': os.getenv('SMTP_SERVER', 'smtp.sendgrid.net'),
+        'port': int(os.getenv('SMTP_PORT', 587)),
+        'username': os.getenv('SMTP_USERNAME', 'apikey' if provider == 'sendgrid' else ''),
+        'password': os.getenv('SMTP_PASSWORD', os.getenv('SENDGRID_API_KEY') if provider == 'sendgrid' else ''),
+        'from_email': os.getenv('FROM_EMAIL', 'your_from_email@example.com'),
+        'use_tls': os.getenv('SMTP_USE_TLS', 'true').lower() != 'false',
+        'workers': int(os.getenv('EMAIL_WORKERS', 3))
+    }
+
+
+def dispatcher_from_env(deliveries=None):
+    settings = smtp_settings()
+    transport = SmtpTransport(
+        settings['host'], settings['port'], settings['username'], settings['password'], settings['use_tls']
+    )
+    return EmailDispatcher(transport, settings['from_email'], deliveries=deliveries, workers=settings['workers'])
+
+
+class SmtpTransport:
+    """Opens SMTP sessions; smtplib is only imported when the first one is needed."""
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+
+    def __call__(self):
+        import smtplib
+
+        session = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            session.starttls()
+        if self.username and self.password:
+            session.login(self.username, self.password)
+        return session
+
+
+class MemoryTransport:
+    """A fake SMTP sink that keeps every message in memory, for tests, benchmarks and load tests."""
+
+    def __init__(self):
+        self.messages = []
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        return self
+
+    def sendmail(self, from_email, to, message):
+        with self._lock:
+            self.messages.append((from_email, to, message))
+        return {}
+
+    def quit(self):
+        pass
+
+    close = quit
+
+
+class EmailDispatcher:
+    """Queue notifications and send them from worker threads over long-lived SMTP sessions.
+
+    Every notification gets a document in the deliveries collection that moves from
+    'queued' to 'sent' or 'failed'; notifications without an address are stored as 'skipped'.
+    deliveries is a zero-argument callable returning that collection, so it is resolved in
+    whichever process ends up sending. transport is a zero-argument callable that opens a
+    session with sendmail() and quit(), such as SmtpTransport or MemoryTransport.
+    """
+
+    def __init__(self, transport, from_email, deliveries=None, workers=3, idle_timeout=30, max_attempts=2):
+        self.transport = transport
+        self.from_email = from_email
+        self.deliveries = deliveries
+        self.workers = workers
+        self.idle_timeout = idle_timeout
+        self.max_attempts = max_attempts
+        self._workers = PerProcess(_Workers)
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start this process's worker threads unless they are running; returns their _Workers."""
+        workers = self._workers.get()
+        with self._lock:
+            if not workers.threads:
+                for i in range(self.workers):
+                    thread = threading.Thread(
+                        target=self._run, args=(workers.queue,), name=f'email-dispatch-{i}', daemon=True
+                    )
+                    thread.start()
+                    workers.threads.append(thread)
+        return workers
+
+    def submit(self, notifications, batch_id=None):
+        """Record the notifications as queued and hand them to the workers without waiting."""
+        batch_id = batch_id or str(ObjectId())
+        created_at = now()
+        pending = []
+        records = []
+        for notification in notifications:
+            record = {
+                '_id': ObjectId(),
+                'batchId': batch_id,
+                'to': notification.get('to'),
+                'recipientId': notification['recipientId'],
+                'role': notification['role'],
+                'subject': notification['subject'],
+                'scheduleId': notification.get('scheduleId'),
+                'status': 'queued',
+                'attempts': 0,
+                'createdAt': created_at,
+                'updatedAt': created_at
+            }
+            if record['to']:
+                pending.append((record, notification['body']))
+            else:
+                logger.warning(f"No email found for {record['role']} ID: {record['recipientId']}")
+                record['status'] = 'skipped'
+                record['error'] = f"No email address for {record['role']}"
+            records.append(record)
+
+        if self.deliveries is not None and records:
+            self.deliveries().insert_many(records)
+        if pending:
+            workers = self.start()
+            for item in pending:
+                workers.queue.put(item)
+        return {'batchId': batch_id, 'queued': len(pending), 'skipped': len(records) - len(pending)}
+
+    def flush(self):
+        """Block until every queued notification has been attempted."""
+        self._workers.get().queue.join()
+
+    def shutdown(self):
+        workers = self._workers.get()
+        with self._lock:
+            threads, workers.threads = workers.threads, []
+        for _ in threads:
+            workers.queue.put(_STOP)
+        for thread in threads:
+            thread.join()
+
+    def _run(self, work_queue):
+        session = None
+        while True:
+            try:
+                item = work_queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                session = self._close(session)
+                continue
+            try:
+                if item is _STOP:
+                    self._close(session)
+                    return
+                record, body = item
+                session = self._deliver(session, record, body)
+            finally:
+                work_queue.task_done()
+
+    def _close(self, session):
+        if session is not None:
+            try:
+                session.quit()
+            except Exception:
+                session.close()
+        return None
+
+    def _build(self, record, body):
+        return build_message(self.from_email, record['to'], record['subject'], body)
+
+    def _deliver(self, session, record, body):
+        import smtplib
+
+        # Errors that reject the message itself; the session is still usable afterwards.
+        permanent_errors = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+        message = self._build(record, body)
+        error = None
+        attempts = 0
+        while attempts < self.max_attempts:
+            attempts += 1
+            try:
+                if session is None:
+                    session = self.transport()
+                session.sendmail(self.from_email, record['to'], message)
+                error = None
+                break
+            except permanent_errors as e:
+                error = str(e)
+                break
+            except smtplib.SMTPAuthenticationError as e:
+                error = f'SMTP authentication failed: {str(e)}'
+                session = self._close(session)
+                break
+            except Exception as e:
+                # Most likely a stale session; reconnect and try again.
+                error = str(e)
+                session = self._close(session)
+
+        if error:
+            logger.error(f"Failed to send email to {record['to']}: {error}")
+        else:
+            logger.info(f"Email sent to {record['to']}")
+        if self.deliveries is not None:
+            update = {'status': 'failed' if error else 'sent', 'attempts': attempts, 'updatedAt': now()}
+            if error:
+                update['error'] = error
+            try:
+                self.deliveries().update_one({'_id': record['_id']}, {'$set': update})
+            except Exception as e:
+                logger.error(f"Failed to record delivery status for {record['to']}: {str(e)}")
+        return session
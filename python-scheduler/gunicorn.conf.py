@@ -0,0 +1,14 @@
+import multiprocessing
+import os
+
+# All settings can be overridden from the environment (or .env via the shell).
+bind = os.getenv('SCHEDULER_BIND', '0.0.0.0:5001')
+# Every worker also gets up to BATCH_PROCESSES solver processes for POST /schedule/batch
+workers = int(os.getenv('SCHEDULER_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('SCHEDULER_THREADS', 4))
+worker_class = 'gthread'
+timeout = int(os.getenv('SCHEDULER_TIMEOUT', 120))
+keepalive = int(os.getenv('SCHEDULER_KEEPALIVE', 5))
+# Safe because MongoClient and the email workers are only created after the fork.
+preload_app = os.getenv('SCHEDULER_PRELOAD', 'true').lower() != 'false'
+accesslog = os.getenv('SCHEDULER_ACCESS_LOG', '-')
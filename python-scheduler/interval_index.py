@@ -0,0 +1,102 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from pytz import UTC
+
+
+def to_utc(value):
+    """Normalise a stored datetime or ISO string to an aware UTC datetime."""
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    # Naive values are UTC, never server-local time
+    return value.astimezone(UTC) if value.tzinfo else UTC.localize(value)
+
+
+class IntervalIndex:
+    """Busy intervals per owner, kept sorted by start so overlaps can be found with bisect."""
+
+    def __init__(self):
+        self._starts = {}
+        self._entries = {}
+        self._max_length = {}
+
+    def add(self, owner, start, end, schedule_id=None):
+        if end <= start:
+            # An empty interval occupies no time and can never overlap anything.
+            return
+        starts = self._starts.setdefault(owner, [])
+        entries = self._entries.setdefault(owner, [])
+        pos = bisect_right(starts, start)
+        starts.insert(pos, start)
+        entries.insert(pos, (start, end, schedule_id))
+        if end - start > self._max_length.get(owner, timedelta(0)):
+            self._max_length[owner] = end - start
+
+    def remove(self, owner, start, schedule_id):
+        """Drop the interval of schedule_id starting at start; returns whether it was found."""
+        starts = self._starts.get(owner, [])
+        entries = self._entries.get(owner, [])
+        pos = bisect_left(starts, start)
+        while pos < len(starts) and starts[pos] == start:
+            if entries[pos][2] == schedule_id:
+                del starts[pos]
+                del entries[pos]
+                return True
+            pos += 1
+        return False
+
+    def overlaps(self, owner, start, end, exclude_id=None):
+        starts = self._starts.get(owner)
+        if not starts:
+            return False
+        entries = self._entries[owner]
+        # Nothing starting at or before this point can reach past `start`.
+        earliest = start - self._max_length[owner]
+        pos = bisect_left(starts, end)
+        while pos > 0:
+            pos -= 1
+            s_start, s_end, schedule_id = entries[pos]
+            if s_start <= earliest:
+                break
+            if exclude_id is not None and schedule_id == exclude_id:
+                continue
+            if s_end > start:
+                return True
+        return False
+
+    def intervals(self, owner):
+        """Return the (start, end, schedule_id) tuples of owner in start order."""
+        return list(self._entries.get(owner, []))
+
+
+class BusyIndex:
+    """Per-examiner and per-student busy intervals with pre-normalised UTC datetimes."""
+
+    def __init__(self):
+        self.examiners = IntervalIndex()
+        self.students = IntervalIndex()
+
+    @classmethod
+    def from_schedules(cls, schedules):
+        index = cls()
+        for schedule in schedules:
+            index.add_schedule(schedule)
+        return index
+
+    def add_schedule(self, schedule):
+        schedule_id = schedule.get('_id')
+        self.add(
+            str(schedule['examinerId']),
+            str(schedule['studentId']),
+            to_utc(schedule['startTime']),
+            to_utc(schedule['endTime']),
+            str(schedule_id) if schedule_id is not None else None
+        )
+
+    def add(self, examiner_id, student_id, start, end, schedule_id=None):
+        self.examiners.add(examiner_id, start, end, schedule_id)
+        self.students.add(student_id, start, end, schedule_id)
+
+    def has_conflict(self, start, end, examiner_id, student_id, exclude_schedule_id=None):
+        exclude_id = str(exclude_schedule_id) if exclude_schedule_id is not None else None
+        return (self.examiners.overlaps(str(examiner_id), start, end, exclude_id)
+                or self.students.overlaps(str(student_id), start, end, exclude_id))
@@ -0,0 +1,75 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from resources import PerProcess, now
+
+logger = logging.getLogger(__name__)
+
+
+class JobProgress:
+    """Handed to a running job so it can report its stage and counts."""
+
+    def __init__(self, runner, job_id):
+        self._runner = runner
+        self.job_id = job_id
+
+    def update(self, **fields):
+        self._runner._set(self.job_id, fields)
+
+
+class JobRunner:
+    """Run long scheduling work on a thread pool and keep each job's state in a collection.
+
+    jobs is a zero-argument callable returning that collection (schedulingjobs). A job
+    document moves from 'queued' to 'running' and ends as 'succeeded' with the job's
+    result or 'failed' with its error; running jobs report progress through JobProgress.
+    """
+
+    def __init__(self, jobs, workers=2):
+        self.jobs = jobs
+        self.workers = workers
+        self._executor = PerProcess(
+            lambda: ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='scheduling-job')
+        )
+
+    def executor(self):
+        return self._executor.get()
+
+    def submit(self, kind, request, fn):
+        """Record a queued job and run fn(progress) in the background; returns the job id."""
+        created_at = now()
+        job_id = self.jobs().insert_one({
+            'kind': kind,
+            'request': request,
+            'status': 'queued',
+            'stage': None,
+            'createdAt': created_at,
+            'updatedAt': created_at
+        }).inserted_id
+        self.executor().submit(self._run, job_id, fn)
+        return str(job_id)
+
+    def get(self, job_id):
+        try:
+            return self.jobs().find_one({'_id': ObjectId(job_id)})
+        except (InvalidId, TypeError):
+            return None
+
+    def shutdown(self, wait=True):
+        executor = self._executor.reset()
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _set(self, job_id, fields):
+        self.jobs().update_one({'_id': job_id}, {'$set': {**fields, 'updatedAt': now()}})
+
+    def _run(self, job_id, fn):
+        self._set(job_id, {'status': 'running', 'startedAt': now()})
+        try:
+            result = fn(JobProgress(self, job_id))
+        except Exception as e:
+            logger.error(f'Scheduling job {job_id} failed: {str(e)}')
+            self._set(job_id, {'status': 'failed', 'error': str(e), 'finishedAt': now()})
+        else:
+            self._set(job_id, {'status': 'succeeded', 'stage': 'done', 'result': result, 'finishedAt': now()})
@@ -0,0 +1,179 @@
+import os
+from datetime import timedelta
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from interval_index import BusyIndex
+
+LOAD_BATCH_SIZE = int(os.getenv('LOAD_BATCH_SIZE', 1000))
+
+AVAILABILITY_FIELDS = {
+    'examinerId': 1, 'module': 1, 'date': 1, 'availableSlots': 1,
+    'weekStart': 1, 'timeSlots': 1, 'updatedAt': 1
+}
+SCHEDULE_FIELDS = {'examinerId': 1, 'studentId': 1, 'startTime': 1, 'endTime': 1}
+EVENT_FIELDS = {'_id': 0, 'startDate': 1, 'endDate': 1, 'duration': 1, 'module': 1, 'examinerIds': 1}
+
+
+def ensure_indexes(db):
+    """Create the indexes the load queries rely on; a no-op when they already exist."""
+    from pymongo import ASCENDING
+
+    db.schedules.create_index([('examinerId', ASCENDING), ('startTime', ASCENDING)])
+    db.schedules.create_index([('studentId', ASCENDING), ('startTime', ASCENDING)])
+    db.schedules.create_index([('eventId', ASCENDING), ('studentId', ASCENDING)])
+    db.schedules.create_index([('jobId', ASCENDING)], sparse=True)
+    db.moduleregistrations.create_index([('moduleCode', ASCENDING), ('registeredAt', ASCENDING)])
+    # One incremental schedule per event and student, whether eventId is a string or an ObjectId
+    db.schedules.create_index([('incrementalKey', ASCENDING)], unique=True, sparse=True)
+
+
+def event_id_values(event_id):
+    """The Node service stores eventId as an ObjectId and this service as a string; match both."""
+    try:
+        return [event_id, ObjectId(event_id)]
+    except (InvalidId, TypeError):
+        return [event_id]
+
+
+def load_event(db, event_id):
+    try:
+        return db.events.find_one({'_id': ObjectId(event_id)}, EVENT_FIELDS)
+    except (InvalidId, TypeError):
+        return None
+
+
+def _with_student_emails(pipeline, fields=()):
+    """Append the stages that join each registration with its student's email and role."""
+    keep = {field: 1 for field in fields}
+    return pipeline + [
+        {'$project': {'_id': 0, 'studentId': 1, **keep}},
+        {'$lookup': {'from': 'users', 'localField': 'studentId', 'foreignField': '_id', 'as': 'student'}},
+        {'$project': {'studentId': 1, 'student.email': 1, 'student.role': 1, **keep}}
+    ]
+
+
+def _collect_students(cursor):
+    student_ids = []
+    student_emails = {}
+    for registration in cursor:
+        student_id = str(registration['studentId'])
+        student_ids.append(student_id)
+        for user in registration.get('student', []):
+            if user.get('role') == 'Student':
+                student_emails[student_id] = user.get('email')
+    return student_ids, student_emails
+
+
+def load_registered_students(db, module):
+    """Return (student_ids, student_emails) for a module in one aggregation round trip.
+
+    student_ids keeps registration order; student_emails only holds users with the Student role.
+    """
+    pipeline = _with_student_emails([{'$match': {'moduleCode': module}}])
+    return _collect_students(db.moduleregistrations.aggregate(pipeline, batchSize=LOAD_BATCH_SIZE))
+
+
+def load_registrations_by_module(db, modules):
+    """Return ({module: student_ids}, student_emails) for several modules in one aggregation."""
+    pipeline = _with_student_emails([{'$match': {'moduleCode': {'$in': list(modules)}}}], ('moduleCode',))
+    students_by_module = {module: [] for module in modules}
+    student_emails = {}
+    for registration in db.moduleregistrations.aggregate(pipeline, batchSize=LOAD_BATCH_SIZE):
+        student_id = str(registration['studentId'])
+        students_by_module[registration['moduleCode']].append(student_id)
+        for user in registration.get('student', []):
+            if user.get('role') == 'Student':
+                student_emails[student_id] = user.get('email')
+    return students_by_module, student_emails
+
+
+def load_unscheduled_students(db, module, event_id):
+    """Like load_registered_students, but only students without a schedule for event_id.
+
+    The event's scheduled students are read from the (eventId, studentId) index and excluded
+    in the registration $match, so only the students still to be placed are joined with
+    users and transferred. The module's registrations are still scanned, so the cost grows
+    with the module's size as well as with the number of new students.
+    """
+    scheduled = [schedule['studentId'] for schedule in db.schedules.find(
+        {'eventId': {'$in': event_id_values(event_id)}}, {'_id': 0, 'studentId': 1}, batch_size=LOAD_BATCH_SIZE
+    )]
+    pipeline = _with_student_emails([{'$match': {'moduleCode': module, 'studentId': {'$nin': scheduled}}}])
+    return _collect_students(db.moduleregistrations.aggregate(pipeline, batchSize=LOAD_BATCH_SIZE))
+
+
+def load_new_registrations(db, module, event_id, since=None):
+    """Students registered for module at or after since that have no schedule for event_id.
+
+    Returns (student_ids, student_emails, registered_at, latest): registered_at maps each
+    returned student to their registeredAt (None when the registration has none) and latest
+    is the newest registeredAt read, scheduled or not. Only the
+    registrations from since on are read, through the (moduleCode, registeredAt) index, and
+    only those students are checked against the event's schedules, so the cost follows the
+    number of new registrations. Without since, every registration of the module is read.
+    """
+    match = {'moduleCode': module}
+    if since is not None:
+        match['registeredAt'] = {'$gte': since}
+    registrations = list(db.moduleregistrations.aggregate(
+        _with_student_emails([{'$match': match}], ('registeredAt',)), batchSize=LOAD_BATCH_SIZE
+    ))
+    scheduled = set()
+    candidate_ids = [registration['studentId'] for registration in registrations]
+    for i in range(0, len(candidate_ids), LOAD_BATCH_SIZE):
+        scheduled.update(schedule['studentId'] for schedule in db.schedules.find(
+            {'eventId': {'$in': event_id_values(event_id)}, 'studentId': {'$in': candidate_ids[i:i + LOAD_BATCH_SIZE]}},
+            {'_id': 0, 'studentId': 1}
+        ))
+    unscheduled = [registration for registration in registrations if registration['studentId'] not in scheduled]
+    student_ids, student_emails = _collect_students(unscheduled)
+    registered_at = {str(registration['studentId']): registration.get('registeredAt') for registration in unscheduled}
+    latest = max((registration['registeredAt'] for registration in registrations if registration.get('registeredAt')), default=None)
+    return student_ids, student_emails, registered_at, latest
+
+
+def load_examiner_emails(db, examiner_ids_obj):
+    examiners = db.users.find(
+        {'_id': {'$in': examiner_ids_obj}, 'role': 'Examiner'},
+        {'email': 1},
+        batch_size=LOAD_BATCH_SIZE
+    )
+    return {str(user['_id']): user.get('email') for user in examiners}
+
+
+def load_availabilities(db, examiner_ids_obj, module, start_date, end_date):
+    """Availability documents of the examiners that can fall inside start_date..end_date."""
+    day_start = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    return db.examineravailabilities.find(
+        {
+            'examinerId': {'$in': examiner_ids_obj},
+            'module': module,
+            '$or': [
+                {'date': {'$gte': day_start, '$lte': end_date}},
+                {'weekStart': {'$gt': day_start - timedelta(days=7), '$lte': end_date}}
+            ]
+        },
+        AVAILABILITY_FIELDS,
+        batch_size=LOAD_BATCH_SIZE
+    )
+
+
+def load_busy_schedules(db, examiner_ids_obj, student_ids_obj, start_date, end_date):
+    """Schedules of these examiners or students that overlap start_date..end_date."""
+    return db.schedules.find(
+        {
+            '$or': [
+                {'examinerId': {'$in': examiner_ids_obj}},
+                {'studentId': {'$in': student_ids_obj}}
+            ],
+            'startTime': {'$lt': end_date},
+            'endTime': {'$gt': start_date}
+        },
+        SCHEDULE_FIELDS,
+        batch_size=LOAD_BATCH_SIZE
+    )
+
+
+def load_busy_index(db, examiner_ids_obj, student_ids_obj, start_date, end_date):
+    """Build the busy index from the schedules of these people that overlap start_date..end_date."""
+    return BusyIndex.from_schedules(load_busy_schedules(db, examiner_ids_obj, student_ids_obj, start_date, end_date))
@@ -0,0 +1,168 @@
+"""Load test for PUT /reschedule/<id> that reports latency percentiles as JSON.
+
+Against a running server (gunicorn or the dev server) and the mongod it uses; point the
+server's SMTP settings at a sink such as aiosmtpd first:
+
+    MONGO_URI=mongodb://localhost:27017/edutimesync_load \
+        python loadtest/reschedule_load.py --seed --url http://localhost:5001
+
+In process, against mongomock and the Flask test client, with email sending disabled:
+
+    python loadtest/reschedule_load.py --in-process
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson.objectid import ObjectId
+
+WINDOW_START = datetime(2030, 1, 7, 8, 0)
+
+
+def seed(db, count, examiners, module='LOAD1001'):
+    """Insert count 30-minute schedules spread over the examiners; returns (id, examinerId, studentId) tuples."""
+    examiner_ids = [ObjectId() for _ in range(examiners)]
+    student_ids = [ObjectId() for _ in range(count)]
+    db.users.insert_many(
+        [{'_id': id, 'role': 'Examiner', 'email': f'examiner{i}@example.com'} for i, id in enumerate(examiner_ids)]
+        + [{'_id': id, 'role': 'Student', 'email': f'student{i}@example.com'} for i, id in enumerate(student_ids)]
+    )
+    schedules = []
+    for i, student_id in enumerate(student_ids):
+        slot = i // examiners
+        start = WINDOW_START + timedelta(days=slot // 20, minutes=30 * (slot % 20))
+        schedules.append({
+            'examinerId': examiner_ids[i % examiners],
+            'studentId': student_id,
+            'startTime': start,
+            'endTime': start + timedelta(minutes=30),
+            'googleMeetLink': f'https://meet.google.com/event-{i + 1}',
+            'module': module,
+            'eventId': 'loadtest'
+        })
+    result = db.schedules.insert_many(schedules)
+    return [(str(id), str(s['examinerId']), str(s['studentId'])) for id, s in zip(result.inserted_ids, schedules)]
+
+
+def random_body(examiner_id, student_id, days):
+    start = WINDOW_START + timedelta(days=random.randrange(days), minutes=30 * random.randrange(20))
+    return {'proposedTime': start.isoformat() + 'Z', 'examinerId': examiner_id, 'studentId': student_id}
+
+
+def http_sender(base_url):
+    def send(schedule_id, body):
+        req = urllib.request.Request(
+            f'{base_url}/reschedule/{schedule_id}',
+            data=json.dumps(body).encode(),
+            headers={'Content-Type': 'application/json'},
+            method='PUT'
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=60) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+    return send
+
+
+def in_process_sender(app):
+    def send(schedule_id, body):
+        return app.test_client().put(f'/reschedule/{schedule_id}', json=body).status_code
+    return send
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run(send, targets, requests, concurrency, days):
+    latencies = []
+    statuses = {}
+
+    def one(_):
+        schedule_id, examiner_id, student_id = random.choice(targets)
+        body = random_body(examiner_id, student_id, days)
+        started = time.perf_counter()
+        try:
+            status = send(schedule_id, body)
+        except Exception as e:
+            status = type(e).__name__
+        return (time.perf_counter() - started) * 1000, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for latency, status in pool.map(one, range(requests)):
+            latencies.append(latency)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(requests / elapsed, 1),
+        'status': statuses,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 2),
+            'p90': round(percentile(latencies, 90), 2),
+            'p99': round(percentile(latencies, 99), 2),
+            'max': round(max(latencies), 2),
+            'mean': round(statistics.mean(latencies), 2)
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5001')
+    parser.add_argument('--in-process', action='store_true', help='use mongomock and the Flask test client')
+    parser.add_argument('--seed', action='store_true', help='insert fresh schedules into MONGO_URI before the run')
+    parser.add_argument('--schedules', type=int, default=2000)
+    parser.add_argument('--examiners', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--days', type=int, default=5, help='spread of proposed times, in days')
+    args = parser.parse_args()
+
+    if args.in_process:
+        import mongomock
+        import scheduler
+        from dispatch import EmailDispatcher, MemoryTransport
+
+        db = mongomock.MongoClient().db
+        # Queue notifications without ever sending them
+        app = scheduler.create_app(
+            db=db, dispatcher=EmailDispatcher(MemoryTransport(), 'loadtest@example.com', workers=0)
+        )
+        targets = seed(db, args.schedules, args.examiners)
+        send = in_process_sender(app)
+    else:
+        from pymongo import MongoClient
+
+        db = MongoClient(os.environ['MONGO_URI']).get_default_database()
+        if args.seed:
+            targets = seed(db, args.schedules, args.examiners)
+        else:
+            targets = [(str(s['_id']), str(s['examinerId']), str(s['studentId']))
+                       for s in db.schedules.find({'eventId': 'loadtest'}, {'examinerId': 1, 'studentId': 1})]
+        if not targets:
+            parser.error('no load-test schedules found; run with --seed first')
+        send = http_sender(args.url.rstrip('/'))
+
+    print(json.dumps(run(send, targets, args.requests, args.concurrency, args.days), indent=2))
+
+
+if __name__ == '__main__':
+    main()
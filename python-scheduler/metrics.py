@@ -0,0 +1,188 @@
+import contextvars
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Requests asking for a profile (?profile=1) get a cProfile dump here; unset disables profiling.
+PROFILE_DIR = os.getenv('SCHEDULER_PROFILE_DIR')
+
+HELP = {
+    'scheduler_requests_total': ('counter', 'HTTP requests by endpoint and status code.'),
+    'scheduler_request_seconds': ('histogram', 'HTTP request latency by endpoint.'),
+    'scheduler_phase_seconds': ('histogram', 'Time spent in each scheduling phase.'),
+    'scheduler_candidates_tried_total': ('counter', 'Candidate slots evaluated by the solver.'),
+    'scheduler_conflicts_hit_total': ('counter', 'Candidate slots or proposed times rejected for a clash.'),
+    'scheduler_students_placed_total': ('counter', 'Students given a schedule.'),
+    'scheduler_students_unplaced_total': ('counter', 'Students that could not be placed.'),
+    'scheduler_notifications_total': ('counter', 'Notifications by outcome at submit time.')
+}
+
+_current = contextvars.ContextVar('scheduler_request_profile', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+class Registry:
+    """Process-local counters and histograms in the Prometheus text format.
+
+    Every gunicorn worker keeps its own registry, so scrape the workers individually or
+    aggregate on the Prometheus side.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(BUCKETS), 0.0, 0]
+            counts = histogram[0]
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            histogram[1] += value
+            histogram[2] += 1
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(h[0]), h[1], h[2])) for key, h in self._histograms.items())
+        lines = []
+        described = set()
+
+        def describe(name):
+            if name not in described and name in HELP:
+                kind, text = HELP[name]
+                lines.append(f'# HELP {name} {text}')
+                lines.append(f'# TYPE {name} {kind}')
+            described.add(name)
+
+        for (name, labels), value in counters:
+            describe(name)
+            lines.append(f'{name}{_labels(labels)} {value}')
+        for (name, labels), (counts, total, count) in histograms:
+            describe(name)
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS, counts):
+                cumulative += bucket
+                lines.append(f'{name}_bucket{_labels(labels, ("le", bound))} {cumulative}')
+            lines.append(f'{name}_bucket{_labels(labels, ("le", "+Inf"))} {count}')
+            lines.append(f'{name}_sum{_labels(labels)} {total:.6f}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestProfile:
+    """Phase timings and counters of a single request."""
+
+    def __init__(self, endpoint, profile=False):
+        self.endpoint = endpoint or 'unknown'
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.counters = {}
+        self.profiler = None
+        if profile and PROFILE_DIR:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def as_dict(self):
+        return {
+            'endpoint': self.endpoint,
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 3),
+            'phases_ms': {name: round(seconds * 1000, 3) for name, seconds in self.phases.items()},
+            'counters': dict(self.counters)
+        }
+
+
+def begin_request(endpoint, profile=False):
+    request_profile = RequestProfile(endpoint, profile)
+    _current.set(request_profile)
+    return request_profile
+
+
+def end_request(status):
+    """Record the current request's latency and status; dumps the profile if one was requested."""
+    request_profile = _current.get()
+    if request_profile is None:
+        return None
+    _current.set(None)
+    elapsed = time.perf_counter() - request_profile.started
+    registry.inc('scheduler_requests_total', endpoint=request_profile.endpoint, status=status)
+    registry.observe('scheduler_request_seconds', elapsed, endpoint=request_profile.endpoint)
+    if request_profile.profiler is not None:
+        request_profile.profiler.disable()
+        return dump_profile(request_profile)
+    return None
+
+
+def dump_profile(request_profile):
+    """Write <endpoint>-<time>-<pid>.prof (cProfile) and .json (phases and counters) to PROFILE_DIR."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(
+        PROFILE_DIR,
+        f"{request_profile.endpoint.replace('.', '_')}-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{id(request_profile):x}"
+    )
+    request_profile.profiler.dump_stats(f'{base}.prof')
+    with open(f'{base}.json', 'w') as f:
+        json.dump(request_profile.as_dict(), f, indent=2)
+    return base
+
+
+@contextmanager
+def phase(name):
+    """Time a block as one phase of the current request (or of no request, outside Flask)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        request_profile = _current.get()
+        endpoint = request_profile.endpoint if request_profile else 'none'
+        registry.observe('scheduler_phase_seconds', elapsed, phase=name, endpoint=endpoint)
+        if request_profile is not None:
+            request_profile.phases[name] = request_profile.phases.get(name, 0) + elapsed
+
+
+def count(name, value=1, **labels):
+    """Add value to the scheduler_<name>_total counter and to the current request's counters."""
+    if not value:
+        return
+    request_profile = _current.get()
+    endpoint = request_profile.endpoint if request_profile else 'none'
+    registry.inc(f'scheduler_{name}_total', value, endpoint=endpoint, **labels)
+    if request_profile is not None:
+        key = '.'.join([name, *map(str, labels.values())])
+        request_profile.counters[key] = request_profile.counters.get(key, 0) + value
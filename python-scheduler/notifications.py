@@ -0,0 +1,198 @@
+import os
+from string import Formatter
+
+# Each template can be replaced by a <name>.txt file in this directory
+TEMPLATE_DIR = os.getenv('NOTIFICATION_TEMPLATE_DIR')
+
+DEFAULT_TEMPLATES = {
+    'placement_subject': 'Exam Schedule for {module}',
+    'placement_student': (
+        'Dear Student,\n\n'
+        'You have been scheduled for an exam for {module}.\n'
+        'Details:\n'
+        'Date: {date}\n'
+        'Time: {start} - {end} UTC\n'
+        'Examiner ID: {examinerId}\n'
+        'Google Meet Link: {googleMeetLink}\n\n'
+        'Please ensure you are available at the scheduled time.\n'
+        'Best regards,\nExam Scheduling Team'
+    ),
+    'placement_examiner': (
+        'Dear Examiner,\n\n'
+        'You have been scheduled to conduct an exam for {module}.\n'
+        'Details:\n'
+        'Student ID: {studentId}\n'
+        'Date: {date}\n'
+        'Time: {start} - {end} UTC\n'
+        'Google Meet Link: {googleMeetLink}\n\n'
+        'Please ensure you are available at the scheduled time.\n'
+        'Best regards,\nExam Scheduling Team'
+    ),
+    'reschedule_subject': 'Exam Reschedule for {module}',
+    'reschedule_student': (
+        'Dear Student,\n\n'
+        'Your exam for {module} has been rescheduled.\n'
+        'New Details:\n'
+        'Date: {date}\n'
+        'Time: {start} - {end} UTC\n'
+        'Examiner ID: {examinerId}\n'
+        'Google Meet Link: {googleMeetLink}\n\n'
+        'Please ensure you are available at the new scheduled time.\n'
+        'Best regards,\nExam Scheduling Team'
+    ),
+    'reschedule_examiner': (
+        'Dear Examiner,\n\n'
+        'Your exam for {module} has been rescheduled.\n'
+        'New Details:\n'
+        'Student ID: {studentId}\n'
+        'Date: {date}\n'
+        'Time: {start} - {end} UTC\n'
+        'Google Meet Link: {googleMeetLink}\n\n'
+        'Please ensure you are available at the new scheduled time.\n'
+        'Best regards,\nExam Scheduling Team'
+    ),
+    'digest_subject': 'Exam Timetable for {module}',
+    'digest_examiner': (
+        'Dear Examiner,\n\n'
+        'You have been scheduled to conduct {count} exams for {module}.\n'
+        'Timetable (UTC):\n'
+        '{rows}\n\n'
+        'Please ensure you are available at the scheduled times.\n'
+        'Best regards,\nExam Scheduling Team'
+    ),
+    'digest_row': '{date} {start} - {end}  Student ID: {studentId}  {googleMeetLink}'
+}
+
+
+class Template:
+    """A str.format-style template parsed once, so rendering only joins strings."""
+
+    def __init__(self, text):
+        self.parts = []
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if spec or conversion:
+                raise ValueError(f'Format specs are not supported in notification templates: {text!r}')
+            self.parts.append((literal, field))
+
+    def render(self, fields):
+        out = []
+        for literal, field in self.parts:
+            out.append(literal)
+            if field is not None:
+                out.append(str(fields[field]))
+        return ''.join(out)
+
+
+def load_templates(directory=None):
+    templates = {}
+    for name, text in DEFAULT_TEMPLATES.items():
+        path = os.path.join(directory, f'{name}.txt') if directory else None
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                text = f.read().rstrip('\n')
+        templates[name] = Template(text)
+    return templates
+
+
+templates = load_templates(TEMPLATE_DIR)
+
+
+def schedule_fields(schedule):
+    start, end = schedule['startTime'], schedule['endTime']
+    return {
+        'module': schedule['module'],
+        'date': start.date(),
+        'start': start.strftime('%H:%M'),
+        'end': end.strftime('%H:%M'),
+        'examinerId': str(schedule['examinerId']),
+        'studentId': str(schedule['studentId']),
+        'googleMeetLink': schedule.get('googleMeetLink')
+    }
+
+
+def _notification(to, recipient_id, role, subject, body, schedule_id):
+    return {'to': to, 'recipientId': recipient_id, 'role': role, 'subject': subject,
+            'body': body, 'scheduleId': schedule_id}
+
+
+def student_notification(schedule, student_email, fields=None, kind='placement'):
+    fields = fields or schedule_fields(schedule)
+    return _notification(
+        student_email, fields['studentId'], 'student', templates[f'{kind}_subject'].render(fields),
+        templates[f'{kind}_student'].render(fields), str(schedule['_id'])
+    )
+
+
+def examiner_notification(schedule, examiner_email, fields=None, kind='placement'):
+    fields = fields or schedule_fields(schedule)
+    return _notification(
+        examiner_email, fields['examinerId'], 'examiner', templates[f'{kind}_subject'].render(fields),
+        templates[f'{kind}_examiner'].render(fields), str(schedule['_id'])
+    )
+
+
+def reschedule_notifications(schedule, student_email, examiner_email):
+    """Build the student and examiner notifications for a rescheduled exam."""
+    fields = schedule_fields(schedule)
+    return [
+        student_notification(schedule, student_email, fields, 'reschedule'),
+        examiner_notification(schedule, examiner_email, fields, 'reschedule')
+    ]
+
+
+class ExaminerDigest:
+    """Collects an event's sessions per examiner for one timetable email each."""
+
+    def __init__(self, module):
+        self.module = module
+        self._rows = {}
+
+    def add(self, schedule, fields=None):
+        fields = fields or schedule_fields(schedule)
+        self._rows.setdefault(fields['examinerId'], []).append((schedule['startTime'], templates['digest_row'].render(fields)))
+
+    def notifications(self, examiner_emails):
+        notifications = []
+        for examiner_id, rows in self._rows.items():
+            rows.sort(key=lambda row: row[0])
+            fields = {'module': self.module, 'count': len(rows), 'rows': '\n'.join(text for _, text in rows)}
+            notifications.append(_notification(
+                examiner_emails.get(examiner_id), examiner_id, 'examiner',
+                templates['digest_subject'].render(fields), templates['digest_examiner'].render(fields), None
+            ))
+        return notifications
+
+
+def build_message(from_email, to, subject, body):
+    """Serialise a single-part text/plain email.
+
+    ASCII messages, the common case, are written out directly; anything else goes
+    through MIMEText for the header and body encoding. Message-IDs use the sender's
+    domain, which avoids a hostname lookup per message.
+    """
+    from email.utils import formatdate, make_msgid
+
+    message_id = make_msgid(domain=from_email.rpartition('@')[2] or None)
+    # Header values with line breaks also take the MIMEText path, which rejects them
+    if subject.isascii() and subject.isprintable() and str(to).isprintable() and body.isascii():
+        return (
+            f'Content-Type: text/plain; charset="us-ascii"\n'
+            f'MIME-Version: 1.0\n'
+            f'Content-Transfer-Encoding: 7bit\n'
+            f'From: {from_email}\n'
+            f'To: {to}\n'
+            f'Subject: {subject}\n'
+            f'Date: {formatdate()}\n'
+            f'Message-ID: {message_id}\n'
+            f'\n'
+            f'{body}\n'
+        )
+    from email.mime.text import MIMEText
+
+    msg = MIMEText(body, 'plain', 'utf-8')
+    msg['From'] = from_email
+    msg['To'] = to
+    msg['Subject'] = subject
+    msg['Date'] = formatdate()
+    msg['Message-ID'] = message_id
+    return msg.as_string()
@@ -0,0 +1,109 @@
+import os
+from datetime import timedelta
+from bson.objectid import ObjectId
+from availability import to_minutes
+from interval_index import to_utc
+from resources import now
+
+# Reservations are taken per owner in buckets of this many minutes. Two intervals that
+# overlap always share a bucket; intervals closer than one bucket apart also collide.
+RESERVATION_MINUTES = int(os.getenv('RESERVATION_MINUTES', 5))
+
+# How long a reservation whose schedule has not (yet) moved into the slot is honoured.
+# It covers the gap between reserve_slot and the schedule update in PUT /reschedule.
+RESERVATION_LEASE_SECONDS = int(os.getenv('RESERVATION_LEASE_SECONDS', 30))
+
+DUPLICATE_KEY = 11000
+
+
+def ensure_reservation_indexes(db):
+    from pymongo import ASCENDING
+
+    db.slotreservations.create_index([('ownerId', ASCENDING), ('minute', ASCENDING)], unique=True)
+    db.slotreservations.create_index([('scheduleId', ASCENDING)])
+    db.slotreservations.create_index([('token', ASCENDING)])
+    # Reservations are only needed until the exam is over
+    db.slotreservations.create_index([('expiresAt', ASCENDING)], expireAfterSeconds=0)
+
+
+def _buckets(start, end):
+    first = to_minutes(start) // RESERVATION_MINUTES * RESERVATION_MINUTES
+    last = to_minutes(end)
+    if end.second or end.microsecond:
+        last += 1
+    return range(first, max(last, first + 1), RESERVATION_MINUTES)
+
+
+def reserve_slot(db, schedule_id, examiner_id, student_id, start, end):
+    """Claim the examiner's and student's time buckets for schedule_id (an ObjectId).
+
+    The unique (ownerId, minute) index guarantees that only one of several concurrent
+    requests for overlapping time wins. A reservation is held while its token is the
+    schedule's reservationToken (written when the schedule moves into the slot) or, until
+    then, for RESERVATION_LEASE_SECONDS. Reservations that are neither, and this schedule's
+    own current ones, are cleared and the insert retried once. Returns the reservation
+    token, or None when the time is held for another schedule or a concurrent request.
+    """
+    from pymongo.errors import BulkWriteError
+
+    token = ObjectId()
+    reserved_at = now()
+    owners = (f'examiner:{examiner_id}', f'student:{student_id}')
+    pending = [{
+        'ownerId': owner,
+        'minute': minute,
+        'scheduleId': schedule_id,
+        'token': token,
+        'createdAt': reserved_at,
+        'expiresAt': end
+    } for owner in owners for minute in _buckets(start, end)]
+
+    for attempt in range(2):
+        try:
+            db.slotreservations.insert_many(pending, ordered=False)
+            return token
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            if any(error.get('code') != DUPLICATE_KEY for error in errors):
+                release(db, token)
+                raise
+            pending = [pending[error['index']] for error in errors]
+
+        keys = [{'ownerId': doc['ownerId'], 'minute': doc['minute']} for doc in pending]
+        holders = list(db.slotreservations.find(
+            {'$or': keys, 'token': {'$ne': token}}, {'scheduleId': 1, 'token': 1, 'createdAt': 1}
+        ))
+        stale = _stale_reservations(db, holders, schedule_id)
+        if len(stale) < len(holders):
+            break
+        db.slotreservations.delete_many({'_id': {'$in': stale}})
+
+    release(db, token)
+    return None
+
+
+def _stale_reservations(db, holders, schedule_id):
+    """The ids of holders that no longer protect a slot from schedule_id."""
+    committed = {doc['_id']: doc.get('reservationToken') for doc in db.schedules.find(
+        {'_id': {'$in': list({holder['scheduleId'] for holder in holders})}}, {'reservationToken': 1}
+    )}
+    lease_start = now() - timedelta(seconds=RESERVATION_LEASE_SECONDS)
+    stale = []
+    for holder in holders:
+        if committed.get(holder['scheduleId']) == holder['token']:
+            # The slot a schedule is in; only that schedule itself may move over it
+            if holder['scheduleId'] == schedule_id:
+                stale.append(holder['_id'])
+        elif holder.get('createdAt') is None or to_utc(holder['createdAt']) <= lease_start:
+            # Left behind by a schedule that moved on or a request that never completed
+            stale.append(holder['_id'])
+    return stale
+
+
+def release(db, token):
+    db.slotreservations.delete_many({'token': token})
+
+
+def release_previous(db, schedule_id, token):
+    """Drop the reservations schedule_id held before it moved to the slot reserved under token."""
+    db.slotreservations.delete_many({'scheduleId': schedule_id, 'token': {'$ne': token}})
@@ -0,0 +1,99 @@
+import os
+import threading
+from datetime import datetime
+from pytz import UTC
+
+_lock = threading.Lock()
+_db_override = None
+_dispatcher = None
+_clock = None
+
+
+class PerProcess:
+    """A value built by factory on first use and rebuilt in every process forked after that.
+
+    Threads, thread and process pools and MongoClient connection pools do not survive
+    fork(), so a gunicorn worker must not use the ones it inherits from the master.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._value = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._value = self.factory()
+                    self._pid = pid
+        return self._value
+
+    def reset(self):
+        """Forget the value, so the next get() builds a new one; returns the old one, if any."""
+        with self._lock:
+            value, self._value, self._pid = self._value, None, None
+        return value
+
+
+def _new_client():
+    from pymongo import MongoClient
+
+    return MongoClient(
+        os.getenv('MONGO_URI'),
+        maxPoolSize=int(os.getenv('MONGO_MAX_POOL_SIZE', 50)),
+        connect=False
+    )
+
+
+_client = PerProcess(_new_client)
+
+
+def get_client():
+    """Return this process's MongoClient, creating it (and its connection pool) on first use."""
+    return _client.get()
+
+
+def get_db():
+    if _db_override is not None:
+        return _db_override
+    return get_client().get_default_database()
+
+
+def set_db(db):
+    """Serve every request from db instead of MONGO_URI (e.g. a mongomock database); None resets."""
+    global _db_override
+    _db_override = db
+
+
+def get_dispatcher():
+    """The notification dispatcher, built from the SMTP settings in the environment on first use."""
+    global _dispatcher
+    if _dispatcher is None:
+        with _lock:
+            if _dispatcher is None:
+                from dispatch import dispatcher_from_env
+
+                _dispatcher = dispatcher_from_env(lambda: get_db().emaildeliveries)
+    return _dispatcher
+
+
+def set_dispatcher(dispatcher):
+    """Send notifications through dispatcher (e.g. one with a MemoryTransport); None resets."""
+    global _dispatcher
+    _dispatcher = dispatcher
+
+
+def now():
+    """The current time as an aware UTC datetime, from the injected clock if there is one."""
+    if _clock is not None:
+        return _clock()
+    return datetime.now(UTC)
+
+
+def set_clock(clock):
+    """Take the current time from clock, a zero-argument callable; None resets."""
+    global _clock
+    _clock = clock
@@ -1,91 +1,66 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from pymongo import MongoClient
 from datetime import datetime, timedelta
+import json
 import os
 from dotenv import load_dotenv
+from bson.errors import InvalidId
 from bson.objectid import ObjectId
 from pytz import UTC
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import logging
 
+# Load .env before the local modules read their settings
+load_dotenv()
+
+from resources import PerProcess, get_db, get_dispatcher, now, set_clock, set_db, set_dispatcher
+from interval_index import BusyIndex, to_utc
+from loaders import (
+    ensure_indexes, event_id_values, load_availabilities, load_busy_index, load_busy_schedules, load_event,
+    load_examiner_emails, load_new_registrations, load_registered_students, load_registrations_by_module,
+    load_unscheduled_students
+)
+from dispatch import smtp_settings
+from jobs import JobRunner
+from batch import connected_components, solve_components
+from watermarks import advance_watermark, load_watermark, reserve_numbers
+from reservations import DUPLICATE_KEY, ensure_reservation_indexes, release, release_previous, reserve_slot
+from availability import examiner_slot_starts, from_minutes, to_minutes
+from suggestions import busy_minutes, free_starts, nearest
+from notifications import (
+    ExaminerDigest, examiner_notification, reschedule_notifications, schedule_fields, student_notification
+)
+from solver import NUMPY_AVAILABLE, greedy_solver, solve_optimal
+import metrics
+from metrics import count, phase
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-load_dotenv()
+bp = Blueprint('scheduler', __name__)
 
-# Configure CORS to allow requests from the Node.js backend
-CORS(app, resources={r"/*": {"origins": "http://localhost:5000"}})
+# How far either side of the requested time reschedule suggestions look, in days
+SUGGESTION_HORIZON_DAYS = int(os.getenv('SUGGESTION_HORIZON_DAYS', 14))
+MAX_SUGGESTIONS = 50
 
-# MongoDB configuration
-mongo_uri = os.getenv('MONGO_URI')
-client = MongoClient(mongo_uri)
-db = client.get_default_database()
+# Schedules committed (and streamed back) per insert_many in streaming mode
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 500))
 
-# Email configuration
-EMAIL_PROVIDER = os.getenv('EMAIL_PROVIDER', 'sendgrid')  # e.g., 'sendgrid', 'outlook', 'zoho', 'custom'
-SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.sendgrid.net')
-SMTP_PORT = int(os.getenv('SMTP_PORT', 587))
-SMTP_USERNAME = os.getenv('SMTP_USERNAME', 'apikey' if EMAIL_PROVIDER == 'sendgrid' else '')
-SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', os.getenv('SENDGRID_API_KEY') if EMAIL_PROVIDER == 'sendgrid' else '')
-FROM_EMAIL = os.getenv('FROM_EMAIL', 'your_from_email@example.com')
+# Default for the examinerDigest request option: one timetable email per examiner and event
+EXAMINER_DIGEST = os.getenv('EXAMINER_DIGEST', 'false').lower() == 'true'
 
-def send_email(to_email, subject, body):
-    """Send an email using SMTP and return success status."""
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = FROM_EMAIL
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain'))
-
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.set_debuglevel(1)  # Enable debug output for SMTP
-            server.starttls()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.sendmail(FROM_EMAIL, to_email, msg.as_string())
-        logger.info(f"Email sent to {to_email} via {EMAIL_PROVIDER}")
-        return True
-    except smtplib.SMTPAuthenticationError as e:
-        logger.error(f"SMTP authentication failed for {to_email}: {str(e)}")
-        return False
-    except Exception as e:
-        logger.error(f"Failed to send email to {to_email}: {str(e)}")
-        return False
-
-def parse_time_slot(slot, date):
-    start_str, end_str = slot.split('-')
-    start_hour, start_min, start_period = start_str.split(':')[0].strip(), start_str.split(':')[1][:2].strip(), start_str[-2:].strip()
-    end_hour, end_min, end_period = end_str.split(':')[0].strip(), end_str.split(':')[1][:2].strip(), end_str[-2:].strip()
-
-    start_hour = int(start_hour)
-    end_hour = int(end_hour)
-    if start_period == 'PM' and start_hour != 12:
-        start_hour += 12
-    if start_period == 'AM' and start_hour == 12:
-        start_hour = 0
-    if end_period == 'PM' and end_hour != 12:
-        end_hour += 12
-    if end_period == 'AM' and end_hour == 12:
-        end_hour = 0
-
-    start_time = UTC.localize(datetime.combine(date, datetime.min.time()).replace(hour=start_hour, minute=int(start_min)))
-    end_time = UTC.localize(datetime.combine(date, datetime.min.time()).replace(hour=end_hour, minute=int(end_min)))
-    return start_time, end_time
+# POST /schedule?async=1 runs here; job state and progress live in the schedulingjobs collection.
+jobs = JobRunner(lambda: get_db().schedulingjobs, workers=int(os.getenv('SCHEDULING_JOB_WORKERS', 2)))
 
 def parse_proposed_time(proposed_time):
     """Parse the proposed time in various formats and return start and end datetime objects"""
-    logger.info(f"Parsing proposed time: {proposed_time}, type: {type(proposed_time)}")
+    logger.debug('Parsing proposed time: %r', proposed_time)
     
     try:
         if isinstance(proposed_time, str):
             start_datetime = datetime.fromisoformat(proposed_time.replace('Z', '+00:00'))
             end_datetime = start_datetime + timedelta(minutes=30)
-            logger.info(f"Parsed ISO string: Start={start_datetime}, End={end_datetime}")
+            logger.debug('Parsed ISO string: Start=%s, End=%s', start_datetime, end_datetime)
             return start_datetime, end_datetime
             
         elif isinstance(proposed_time, dict) and 'date' in proposed_time:
@@ -108,7 +83,7 @@ def parse_proposed_time(proposed_time):
                 else:
                     end_datetime = start_datetime + timedelta(minutes=30)
                     
-                logger.info(f"Parsed dict with time: Start={start_datetime}, End={end_datetime}")
+                logger.debug('Parsed dict with time: Start=%s, End=%s', start_datetime, end_datetime)
                 return start_datetime, end_datetime
         
         logger.error(f"Unknown format for proposed_time: {proposed_time}")
@@ -118,194 +93,518 @@ def parse_proposed_time(proposed_time):
         logger.error(f"Error in parse_proposed_time: {str(e)}")
         raise ValueError(f"Failed to parse proposedTime: {str(e)}")
 
-def has_conflict(new_start, new_end, existing_schedules, examiner_id, student_id, exclude_schedule_id=None):
-    for schedule in existing_schedules:
-        if exclude_schedule_id and str(schedule['_id']) == str(exclude_schedule_id):
-            continue
-        start_str = schedule['startTime']
-        end_str = schedule['endTime']
-        
-        if isinstance(start_str, datetime):
-            s_start = start_str if start_str.tzinfo else UTC.localize(start_str)
-            s_end = end_str if end_str.tzinfo else UTC.localize(end_str)
-        else:
-            s_start = datetime.fromisoformat(start_str.replace('Z', '+00:00'))
-            s_end = datetime.fromisoformat(end_str.replace('Z', '+00:00'))
-
-        examiner_conflict = str(schedule['examinerId']) == str(examiner_id)
-        student_conflict = str(schedule['studentId']) == str(student_id)
-        time_conflict = new_start < s_end and new_end > s_start
-        if (examiner_conflict or student_conflict) and time_conflict:
-            return True
-    return False
-
-@app.route('/schedule', methods=['POST'])
+def has_conflict(new_start, new_end, busy_index, examiner_id, student_id, exclude_schedule_id=None):
+    """Check the examiner's and student's busy intervals for an overlap in O(log n)."""
+    return busy_index.has_conflict(new_start, new_end, examiner_id, student_id, exclude_schedule_id)
+
+class SchedulingError(Exception):
+    """A scheduling request that cannot be fulfilled; reported to the caller as a 400."""
+
+def parse_schedule_request(data):
+    """Validate a scheduling request body; raises KeyError or ValueError."""
+    params = {
+        'startDate': to_utc(data['startDate']),
+        'endDate': to_utc(data['endDate']),
+        'duration': int(data['duration']),
+        'module': data['module'],
+        'examinerIds': [str(id) for id in data['examinerIds']],
+        'eventId': data.get('eventId'),
+        'strategy': data.get('strategy', 'greedy'),
+        'backend': data.get('backend', 'python'),
+        'examinerDigest': bool(data.get('examinerDigest', EXAMINER_DIGEST))
+    }
+    if params['duration'] <= 0:
+        raise ValueError('duration must be a positive number of minutes')
+    if params['strategy'] not in ('greedy', 'optimal'):
+        raise ValueError(f"Unknown strategy: {params['strategy']}")
+    if params['backend'] not in ('python', 'numpy'):
+        raise ValueError(f"Unknown backend: {params['backend']}")
+    if params['backend'] == 'numpy' and not NUMPY_AVAILABLE:
+        raise ValueError('The numpy backend requires numpy to be installed')
+    return params
+
+def place_students(params, student_ids):
+    """Place student_ids into the examiners' free availability for the event in params.
+
+    Returns (placements, unplaced, examiner_emails). Raises SchedulingError when there is
+    no availability, or when the greedy strategy meets a student it cannot place.
+    """
+    start_date, end_date, duration = params['startDate'], params['endDate'], params['duration']
+    db = get_db()
+    examiner_ids_obj = [ObjectId(id) for id in params['examinerIds']]
+    with phase('load_availability'):
+        availabilities = list(load_availabilities(db, examiner_ids_obj, params['module'], start_date, end_date))
+        examiner_emails = load_examiner_emails(db, examiner_ids_obj)
+
+    with phase('slot_parsing'):
+        slots_by_examiner = examiner_slot_starts(availabilities, duration, to_minutes(start_date), to_minutes(end_date))
+    if not slots_by_examiner:
+        raise SchedulingError('No examiner availability within event dates')
+
+    # Only schedules overlapping the event window can clash with a candidate slot
+    student_ids_obj = [ObjectId(id) for id in student_ids]
+    with phase('load_busy'):
+        busy_index = load_busy_index(db, examiner_ids_obj, student_ids_obj, start_date, end_date)
+
+    stats = {}
+    if params['strategy'] == 'optimal':
+        solve = solve_optimal
+    else:
+        solve = greedy_solver(params['backend'])
+    with phase('placement'):
+        placements, unplaced = solve(student_ids, slots_by_examiner, duration, busy_index, stats)
+    count('candidates_tried', stats.get('candidates_tried', 0))
+    count('conflicts_hit', stats.get('conflicts_hit', 0))
+    count('students_placed', len(placements))
+    count('students_unplaced', len(unplaced))
+
+    if unplaced:
+        if params['strategy'] != 'optimal':
+            raise SchedulingError(f'No conflict-free slot for student {unplaced[0]}')
+        logger.warning(f"{len(unplaced)} students could not be placed for module: {params['module']}")
+    return placements, unplaced, examiner_emails
+
+def build_schedules(params, placements, first_number=1):
+    return [{
+        'examinerId': ObjectId(examiner_id),
+        'studentId': ObjectId(student_id),
+        'startTime': start_time,
+        'endTime': end_time,
+        'googleMeetLink': f'https://meet.google.com/event-{first_number + i}',
+        'module': params['module'],
+        'eventId': params['eventId'],
+        **({'jobId': params['jobId']} if params.get('jobId') else {}),
+        'createdAt': now()
+    } for i, (student_id, examiner_id, start_time, end_time) in enumerate(placements)]
+
+def serialize_schedule(schedule):
+    return {
+        '_id': schedule['_id'],
+        'examinerId': str(schedule['examinerId']),
+        'studentId': str(schedule['studentId']),
+        'startTime': schedule['startTime'].isoformat(),
+        'endTime': schedule['endTime'].isoformat(),
+        'googleMeetLink': schedule['googleMeetLink'],
+        'module': schedule['module'],
+        'eventId': schedule['eventId']
+    }
+
+def new_digest(params):
+    return ExaminerDigest(params['module']) if params['examinerDigest'] else None
+
+def notify_placed(schedules, student_emails, examiner_emails, digest=None, batch_id=None):
+    """Queue the notifications for newly placed schedules.
+
+    With a digest, examiners are not notified per schedule; their sessions are collected
+    in it instead and sent with notify_digest once the whole event is placed.
+    """
+    notifications = []
+    with phase('render'):
+        for schedule in schedules:
+            # Formatted once and shared by the student, examiner and digest renderings
+            fields = schedule_fields(schedule)
+            notifications.append(student_notification(schedule, student_emails.get(fields['studentId']), fields))
+            if digest is None:
+                notifications.append(examiner_notification(schedule, examiner_emails.get(fields['examinerId']), fields))
+            else:
+                digest.add(schedule, fields)
+    return submit_notifications(notifications, batch_id)
+
+def notify_digest(digest, examiner_emails, summary=None):
+    """Send the examiners' timetables, in the same batch as summary when given; returns the combined summary."""
+    with phase('render'):
+        notifications = digest.notifications(examiner_emails)
+    digest_summary = submit_notifications(notifications, summary['batchId'] if summary else None)
+    if summary is None:
+        return digest_summary
+    return {
+        'batchId': summary['batchId'],
+        'queued': summary['queued'] + digest_summary['queued'],
+        'skipped': summary['skipped'] + digest_summary['skipped']
+    }
+
+def submit_notifications(notifications, batch_id=None):
+    with phase('email'):
+        # Queued here and sent in the background over pooled SMTP sessions; per-recipient
+        # delivery status lands in the emaildeliveries collection.
+        summary = get_dispatcher().submit(notifications, batch_id)
+    count('notifications', summary['queued'], outcome='queued')
+    count('notifications', summary['skipped'], outcome='skipped')
+    return summary
+
+@bp.route('/schedule', methods=['POST'])
 def create_schedules():
     data = request.get_json()
-    logger.info(f'Received data: {data}')
+    db = get_db()
+    logger.debug('Received data: %s', data)
     try:
-        start_date = datetime.fromisoformat(data['startDate'].replace('Z', '+00:00'))
-        end_date = datetime.fromisoformat(data['endDate'].replace('Z', '+00:00'))
-        duration = data['duration']
-        module = data['module']
-        examiner_ids = data['examinerIds']
-        event_id = data.get('eventId')
+        params = parse_schedule_request(data)
     except (KeyError, ValueError) as e:
         logger.error(f'Error parsing request data: {str(e)}')
         return jsonify({'error': f'Invalid request data: {str(e)}'}), 400
 
-    # Fetch module registrations and join with users to get student emails
-    registrations = list(db.moduleregistrations.find({'moduleCode': module}))
-    if not registrations:
-        logger.error(f'No students registered for module: {module}')
-        return jsonify({'error': 'No students registered for this module'}), 400
+    if request.args.get('stream') == '1':
+        return stream_schedules(params)
+    if request.args.get('async') == '1':
+        job_id = jobs.submit('schedule', data, lambda progress: run_schedule_job(params, progress))
+        return jsonify({'jobId': job_id, 'status': 'queued', 'statusUrl': f'/schedule/jobs/{job_id}'}), 202
 
-    student_ids = [str(reg['studentId']) for reg in registrations]
-    student_ids_obj = [ObjectId(id) for id in student_ids]
-    
-    # Fetch student emails from users collection
-    students = list(db.users.find({'_id': {'$in': student_ids_obj}, 'role': 'Student'}))
-    student_emails = {str(user['_id']): user.get('email') for user in students}
-
-    examiner_ids_obj = [ObjectId(id) for id in examiner_ids]
-    availabilities = list(db.examineravailabilities.find({'examinerId': {'$in': examiner_ids_obj}, 'module': module}))
-    
-    # Fetch examiner emails from users collection
-    examiners = list(db.users.find({'_id': {'$in': examiner_ids_obj}, 'role': 'Examiner'}))
-    examiner_emails = {str(user['_id']): user.get('email') for user in examiners}
-
-    slots_by_examiner = {}
-    for avail in availabilities:
-        examiner_id = str(avail['examinerId'])
-        date = avail['date']
-        if start_date.date() <= date.date() <= end_date.date():
-            slots = []
-            for slot in avail['availableSlots']:
-                start_time, end_time = parse_time_slot(slot, date)
-                if start_date <= start_time and end_time <= end_date:
-                    slots.append({'startTime': start_time, 'endTime': end_time})
-            slots_by_examiner[examiner_id] = slots
-
-    if not any(slots_by_examiner.values()):
-        logger.error('No examiner availability within event dates')
-        return jsonify({'error': 'No examiner availability within event dates'}), 400
-
-    existing_schedules = list(db.schedules.find({'$or': [
-        {'examinerId': {'$in': examiner_ids_obj}},
-        {'studentId': {'$in': student_ids_obj}}
-    ]}))
-
-    schedules = []
-    failed_emails = []
-    available_examiners = list(slots_by_examiner.keys())
-    if not available_examiners:
-        logger.error('No examiners with available slots')
-        return jsonify({'error': 'No examiners with available slots'}), 400
-
-    examiner_index = 0
-    for student_id in student_ids:
-        examiner_id = available_examiners[examiner_index % len(available_examiners)]
-        avail_slots = slots_by_examiner[examiner_id]
-
-        scheduled = False
-        for slot in avail_slots:
-            current_start = slot['startTime']
-            while current_start + timedelta(minutes=duration) <= slot['endTime']:
-                current_end = current_start + timedelta(minutes=duration)
-                if not has_conflict(current_start, current_end, existing_schedules + schedules, examiner_id, student_id):
-                    schedule = {
-                        'examinerId': ObjectId(examiner_id),
-                        'studentId': ObjectId(student_id),
-                        'startTime': current_start,
-                        'endTime': current_end,
-                        'googleMeetLink': f'https://meet.google.com/event-{len(schedules) + 1}',
-                        'module': module,
-                        'eventId': event_id,
-                        'createdAt': datetime.now(UTC)
-                    }
-                    schedules.append(schedule)
-                    scheduled = True
-                    
-                    # Send email to student
-                    student_email = student_emails.get(student_id)
-                    if student_email:
-                        subject = f"Exam Schedule for {module}"
-                        body = (
-                            f"Dear Student,\n\n"
-                            f"You have been scheduled for an exam for {module}.\n"
-                            f"Details:\n"
-                            f"Date: {current_start.date()}\n"
-                            f"Time: {current_start.strftime('%H:%M')} - {current_end.strftime('%H:%M')} UTC\n"
-                            f"Examiner ID: {examiner_id}\n"
-                            f"Google Meet Link: {schedule['googleMeetLink']}\n\n"
-                            f"Please ensure you are available at the scheduled time.\n"
-                            f"Best regards,\nExam Scheduling Team"
-                        )
-                        if not send_email(student_email, subject, body):
-                            failed_emails.append({'email': student_email, 'reason': 'Failed to send student email'})
-                    else:
-                        logger.warning(f"No email found for student ID: {student_id}")
-                        failed_emails.append({'email': student_id, 'reason': 'No email address for student'})
-                    
-                    # Send email to examiner
-                    examiner_email = examiner_emails.get(examiner_id)
-                    if examiner_email:
-                        subject = f"Exam Schedule for {module}"
-                        body = (
-                            f"Dear Examiner,\n\n"
-                            f"You have been scheduled to conduct an exam for {module}.\n"
-                            f"Details:\n"
-                            f"Student ID: {student_id}\n"
-                            f"Date: {current_start.date()}\n"
-                            f"Time: {current_start.strftime('%H:%M')} - {current_end.strftime('%H:%M')} UTC\n"
-                            f"Google Meet Link: {schedule['googleMeetLink']}\n\n"
-                            f"Please ensure you are available at the scheduled time.\n"
-                            f"Best regards,\nExam Scheduling Team"
-                        )
-                        if not send_email(examiner_email, subject, body):
-                            failed_emails.append({'email': examiner_email, 'reason': 'Failed to send examiner email'})
-                    else:
-                        logger.warning(f"No email found for examiner ID: {examiner_id}")
-                        failed_emails.append({'email': examiner_id, 'reason': 'No email address for examiner'})
-                    
-                    break
-                current_start += timedelta(minutes=duration)
-            if scheduled:
-                break
+    try:
+        # Registrations and student emails come back together from one aggregation
+        with phase('load_students'):
+            student_ids, student_emails = load_registered_students(db, params['module'])
+        if not student_ids:
+            raise SchedulingError('No students registered for this module')
+        placements, unplaced, examiner_emails = place_students(params, student_ids)
+    except SchedulingError as e:
+        logger.error(f"{str(e)} (module: {params['module']})")
+        return jsonify({'error': str(e)}), 400
 
-        if not scheduled:
-            logger.error(f'No conflict-free slot for student: {student_id}')
-            return jsonify({'error': f'No conflict-free slot for student {student_id}'}), 400
-        examiner_index += 1
+    schedules = build_schedules(params, placements)
 
     # Save schedules to database
     if schedules:
-        result = db.schedules.insert_many(schedules)
+        with phase('insert'):
+            result = db.schedules.insert_many(schedules)
         # Update schedules with inserted _ids
         for i, schedule in enumerate(schedules):
             schedule['_id'] = str(result.inserted_ids[i])
-    
-    logger.info(f'Generated schedules: {schedules}')
+
+    digest = new_digest(params)
+    notification_summary = notify_placed(schedules, student_emails, examiner_emails, digest)
+    if digest is not None:
+        notification_summary = notify_digest(digest, examiner_emails, notification_summary)
+
+    logger.debug('Generated schedules: %s', schedules)
+    response = {
+        'schedules': [serialize_schedule(schedule) for schedule in schedules],
+        'notifications': notification_summary
+    }
+    if params['strategy'] == 'optimal':
+        response['unplaced'] = unplaced
+    return jsonify(response), 200
+
+def commit_chunks(db, params, placements, first_number, student_emails, examiner_emails, digest=None):
+    """Insert the placements STREAM_CHUNK_SIZE at a time with unordered insert_many calls.
+
+    Yields (schedules, notification summary) after each chunk is committed and notified;
+    with a digest, examiner sessions are collected in it as for notify_placed. When a chunk
+    is only partly inserted, the schedules that did go in are read back, notified and
+    yielded before the BulkWriteError is re-raised.
+    """
+    from pymongo.errors import BulkWriteError
+
+    for offset in range(0, len(placements), STREAM_CHUNK_SIZE):
+        chunk = build_schedules(params, placements[offset:offset + STREAM_CHUNK_SIZE], first_number + offset)
+        try:
+            with phase('insert'):
+                result = db.schedules.insert_many(chunk, ordered=False)
+        except BulkWriteError:
+            # insert_many assigned every _id before sending the chunk
+            ids = [schedule['_id'] for schedule in chunk if '_id' in schedule]
+            inserted_ids = {doc['_id'] for doc in db.schedules.find({'_id': {'$in': ids}}, {'_id': 1})}
+            inserted = [schedule for schedule in chunk if schedule.get('_id') in inserted_ids]
+            for schedule in inserted:
+                schedule['_id'] = str(schedule['_id'])
+            if inserted:
+                yield inserted, notify_placed(inserted, student_emails, examiner_emails, digest)
+            raise
+        for schedule, schedule_id in zip(chunk, result.inserted_ids):
+            schedule['_id'] = str(schedule_id)
+        yield chunk, notify_placed(chunk, student_emails, examiner_emails, digest)
+
+def ndjson(record):
+    return json.dumps(record, default=str) + '\n'
+
+def stream_schedules(params):
+    """POST /schedule?stream=1: commit schedules chunk by chunk and stream them back as NDJSON.
+
+    Every STREAM_CHUNK_SIZE placements are inserted with an unordered insert_many, notified
+    and written out as one {"type": "schedule"} line each, followed by a {"type": "checkpoint"}
+    line with the running total. The last line is a {"type": "summary"}, or a {"type": "error"}
+    if a chunk failed. Only students without a schedule for the event are placed, so posting
+    the same request again resumes after the last committed chunk.
+    """
+    db = get_db()
+    if not params['eventId']:
+        return jsonify({'error': 'Streaming requires an eventId so an interrupted run can be resumed'}), 400
+    try:
+        with phase('load_students'):
+            student_ids, student_emails = load_unscheduled_students(db, params['module'], params['eventId'])
+        placements, unplaced, examiner_emails = place_students(params, student_ids) if student_ids else ([], [], {})
+    except SchedulingError as e:
+        logger.error(f"{str(e)} (module: {params['module']})")
+        return jsonify({'error': str(e)}), 400
+
+    from pymongo.errors import PyMongoError
+
+    # Numbering carries on from the chunks committed by an earlier, interrupted run
+    already_committed = db.schedules.count_documents({'eventId': {'$in': event_id_values(params['eventId'])}})
+
+    def generate():
+        committed = 0
+        digest = new_digest(params)
+        chunks = commit_chunks(db, params, placements, already_committed + 1, student_emails, examiner_emails, digest)
+        try:
+            for chunk, notification_summary in chunks:
+                committed += len(chunk)
+                for schedule in chunk:
+                    yield ndjson({'type': 'schedule', **serialize_schedule(schedule)})
+                yield ndjson({
+                    'type': 'checkpoint',
+                    'committed': committed,
+                    'remaining': len(placements) - committed,
+                    'notifications': notification_summary
+                })
+        except PyMongoError as e:
+            # Schedules from a partly inserted chunk were streamed and notified above
+            logger.error(f"Streaming insert failed after {committed} schedules (event: {params['eventId']}): {str(e)}")
+            yield ndjson({'type': 'error', 'error': str(e), 'committed': committed, 'resumable': True})
+            return
+        summary = {
+            'type': 'summary',
+            'placed': committed,
+            'previouslyCommitted': already_committed,
+            'unplaced': unplaced
+        }
+        if digest is not None:
+            # Timetables list the sessions committed by this run
+            summary['digestNotifications'] = notify_digest(digest, examiner_emails)
+        yield ndjson(summary)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def run_schedule_job(params, progress):
+    """The work of POST /schedule?async=1, run on the job pool with progress kept in schedulingjobs."""
+    db = get_db()
+    params = {**params, 'jobId': progress.job_id}
+    progress.update(stage='loading')
+    with phase('load_students'):
+        student_ids, student_emails = load_registered_students(db, params['module'])
+    if not student_ids:
+        raise SchedulingError('No students registered for this module')
+    progress.update(stage='placing', total=len(student_ids), placed=0)
+    placements, unplaced, examiner_emails = place_students(params, student_ids)
+
+    progress.update(stage='inserting')
+    placed = 0
+    batches = []
+    digest = new_digest(params)
+    for chunk, notification_summary in commit_chunks(db, params, placements, 1, student_emails, examiner_emails, digest):
+        placed += len(chunk)
+        batches.append(notification_summary['batchId'])
+        progress.update(placed=placed)
+    if digest is not None:
+        batches.append(notify_digest(digest, examiner_emails)['batchId'])
+    return {'placed': placed, 'unplaced': unplaced, 'notificationBatches': batches}
+
+@bp.route('/schedule/jobs/<job_id>', methods=['GET'])
+def get_schedule_job(job_id):
+    """Status and progress of a scheduling job; ?include=schedules adds the schedules it created."""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    response = {
+        'jobId': str(job['_id']),
+        'status': job['status'],
+        'stage': job.get('stage'),
+        'progress': {'placed': job.get('placed', 0), 'total': job.get('total')},
+        'createdAt': job['createdAt'].isoformat(),
+        'startedAt': job['startedAt'].isoformat() if job.get('startedAt') else None,
+        'finishedAt': job['finishedAt'].isoformat() if job.get('finishedAt') else None
+    }
+    if job['status'] == 'succeeded':
+        response['result'] = job['result']
+        if request.args.get('include') == 'schedules':
+            schedules = get_db().schedules.find({'jobId': job['_id']}).sort('_id', 1)
+            response['schedules'] = [serialize_schedule({**s, '_id': str(s['_id'])}) for s in schedules]
+    elif job['status'] == 'failed':
+        response['error'] = job.get('error')
+    return jsonify(response), 200
+
+@bp.route('/schedule/batch', methods=['POST'])
+def schedule_batch():
+    """Schedule several events in one run against a shared view of examiner and student time.
+
+    The body is {"events": [...]}, each event shaped like a POST /schedule body. Registrations,
+    examiner emails and busy schedules are loaded once for all events. Events that share no
+    examiner or student are independent and are solved in parallel worker processes; events
+    that do are solved together in request order, each seeing the placements before it.
+    """
+    data = request.get_json(silent=True) or {}
+    db = get_db()
+    logger.debug('Batch scheduling request: %s', data)
+    try:
+        events = [parse_schedule_request(event) for event in data['events']]
+        if not events:
+            raise ValueError('events must not be empty')
+    except (KeyError, TypeError, ValueError) as e:
+        logger.error(f'Error parsing request data: {str(e)}')
+        return jsonify({'error': f'Invalid request data: {str(e)}'}), 400
+
+    with phase('load_students'):
+        students_by_module, student_emails = load_registrations_by_module(db, {event['module'] for event in events})
+    examiner_ids = list(dict.fromkeys(id for event in events for id in event['examinerIds']))
+    student_ids = list(dict.fromkeys(id for ids in students_by_module.values() for id in ids))
+    examiner_ids_obj = [ObjectId(id) for id in examiner_ids]
+    with phase('load_availability'):
+        examiner_emails = load_examiner_emails(db, examiner_ids_obj)
+        availabilities = [list(load_availabilities(
+            db, [ObjectId(id) for id in event['examinerIds']], event['module'], event['startDate'], event['endDate']
+        )) for event in events]
+    with phase('slot_parsing'):
+        tasks = [{
+            'student_ids': students_by_module[event['module']],
+            'slots_by_examiner': examiner_slot_starts(
+                docs, event['duration'], to_minutes(event['startDate']), to_minutes(event['endDate'])
+            ),
+            'duration': event['duration'],
+            'strategy': event['strategy'],
+            'backend': event['backend']
+        } for event, docs in zip(events, availabilities)]
+    with phase('load_busy'):
+        schedules = list(load_busy_schedules(
+            db, examiner_ids_obj, [ObjectId(id) for id in student_ids],
+            min(event['startDate'] for event in events), max(event['endDate'] for event in events)
+        ))
+
+    components = connected_components([(task['slots_by_examiner'].keys(), task['student_ids']) for task in tasks])
+    work = []
+    for positions in components:
+        examiners = {id for i in positions for id in tasks[i]['slots_by_examiner']}
+        students = {id for i in positions for id in tasks[i]['student_ids']}
+        relevant = [s for s in schedules if str(s['examinerId']) in examiners or str(s['studentId']) in students]
+        work.append(([tasks[i] for i in positions], relevant))
+    with phase('placement'):
+        solved = solve_components(work)
+    results = [None] * len(events)
+    for positions, component_results in zip(components, solved):
+        for i, result in zip(positions, component_results):
+            results[i] = result
+
+    response_events = []
+    for event, (placements, unplaced, error) in zip(events, results):
+        count('students_placed', len(placements))
+        count('students_unplaced', len(unplaced))
+        inserted = []
+        notification_batches = []
+        digest = new_digest(event)
+        for chunk, notification_summary in commit_chunks(db, event, placements, 1, student_emails, examiner_emails, digest):
+            inserted.extend(chunk)
+            notification_batches.append(notification_summary['batchId'])
+        if digest is not None and inserted:
+            notification_batches.append(notify_digest(digest, examiner_emails)['batchId'])
+        entry = {
+            'eventId': event['eventId'],
+            'module': event['module'],
+            'schedules': [serialize_schedule(schedule) for schedule in inserted],
+            'unplaced': unplaced,
+            'notificationBatches': notification_batches
+        }
+        if error:
+            logger.error(f"{error} (module: {event['module']})")
+            entry['error'] = error
+        response_events.append(entry)
+    return jsonify({'events': response_events, 'components': len(components)}), 200
+
+@bp.route('/schedule/<event_id>/incremental', methods=['POST'])
+def schedule_incremental(event_id):
+    """Place only the registered students that have no schedule for this event yet.
+
+    Event details come from the events collection and can be overridden in the body.
+    Only registrations made since the event's watermark (see watermarks.py) are read, and
+    Meet link numbers come from the event's counter, so a run costs in proportion to the
+    new registrations rather than to the event. Students left unplaced are read again on
+    the next run.
+    Schedules are upserted on (eventId, studentId), so retrying after a partial failure
+    never creates duplicates. They also carry a unique incrementalKey ('<eventId>:<studentId>');
+    when two runs place the same student at once, the second upsert fails on it and the
+    first run's schedule stands.
+    """
+    data = request.get_json(silent=True) or {}
+    db = get_db()
+    logger.debug('Incremental scheduling for event %s: %s', event_id, data)
+    event = load_event(db, event_id)
+    if event is None and 'module' not in data:
+        return jsonify({'error': 'Event not found'}), 404
+    try:
+        params = parse_schedule_request({**(event or {}), 'strategy': 'optimal', **data, 'eventId': event_id})
+    except (KeyError, ValueError) as e:
+        logger.error(f'Error parsing request data: {str(e)}')
+        return jsonify({'error': f'Invalid request data: {str(e)}'}), 400
+
+    try:
+        with phase('load_students'):
+            watermark = load_watermark(db, event_id)
+            student_ids, student_emails, registered_at, latest = load_new_registrations(
+                db, params['module'], event_id, watermark.get('registeredAt')
+            )
+        if not student_ids:
+            advance_watermark(db, event_id, latest)
+            return jsonify({'schedules': [], 'unplaced': [], 'message': 'All registered students are already scheduled'}), 200
+        placements, unplaced, examiner_emails = place_students(params, student_ids)
+    except SchedulingError as e:
+        logger.error(f"{str(e)} (event: {event_id})")
+        return jsonify({'error': str(e)}), 400
+
+    from pymongo import UpdateOne
+    from pymongo.errors import BulkWriteError
+
+    event_filter = {'eventId': {'$in': event_id_values(event_id)}}
+    schedules = build_schedules(params, placements, reserve_numbers(db, event_id, len(placements)) if placements else 1)
+    inserted = []
+    if schedules:
+        operations = []
+        for schedule in schedules:
+            fields = {key: value for key, value in schedule.items() if key != 'studentId'}
+            fields['incrementalKey'] = f"{event_id}:{schedule['studentId']}"
+            operations.append(UpdateOne(
+                {**event_filter, 'studentId': schedule['studentId']},
+                {'$setOnInsert': fields},
+                upsert=True
+            ))
+        try:
+            with phase('insert'):
+                upserted_ids = db.schedules.bulk_write(operations, ordered=False).upserted_ids
+        except BulkWriteError as e:
+            if any(error.get('code') != DUPLICATE_KEY for error in e.details.get('writeErrors', [])):
+                raise
+            # Students placed concurrently by another run keep that run's schedule
+            upserted_ids = {upsert['index']: upsert['_id'] for upsert in e.details.get('upserted', [])}
+        for i, schedule_id in upserted_ids.items():
+            schedules[i]['_id'] = str(schedule_id)
+            inserted.append(schedules[i])
+
+    unplaced_registered_at = [registered_at[student_id] for student_id in unplaced]
+    if None not in unplaced_registered_at:
+        advance_watermark(db, event_id, latest, min(unplaced_registered_at, default=None))
+
+    digest = new_digest(params)
+    notification_summary = notify_placed(inserted, student_emails, examiner_emails, digest)
+    if digest is not None:
+        notification_summary = notify_digest(digest, examiner_emails, notification_summary)
+
+    logger.debug('Incrementally generated schedules: %s', inserted)
     response = {
-        'schedules': [{
-            '_id': schedule['_id'],
-            'examinerId': str(schedule['examinerId']),
-            'studentId': str(schedule['studentId']),
-            'startTime': schedule['startTime'].isoformat(),
-            'endTime': schedule['endTime'].isoformat(),
-            'googleMeetLink': schedule['googleMeetLink'],
-            'module': schedule['module'],
-            'eventId': schedule['eventId']
-        } for schedule in schedules]
+        'schedules': [serialize_schedule(schedule) for schedule in inserted],
+        'unplaced': unplaced,
+        'notifications': notification_summary
     }
-    if failed_emails:
-        response['failed_emails'] = failed_emails
     return jsonify(response), 200
 
-@app.route('/reschedule/<schedule_id>', methods=['PUT'])
+@bp.route('/reschedule/<schedule_id>', methods=['PUT'])
 def reschedule_exam(schedule_id):
+    """Move a schedule without a read-check-write race.
+
+    The target schedule and everything overlapping the proposed time for the examiner or
+    student come back in one query, and both emails in one $in query. The examiner's and
+    student's time is then claimed in slotreservations (unique per owner and time bucket),
+    and the schedule is moved with a version-checked find_one_and_update that records the
+    reservation token and returns the updated document.
+    """
     data = request.get_json()
-    logger.info(f'Reschedule request data: {data}')
+    db = get_db()
+    logger.debug('Reschedule request data: %s', data)
     proposed_time = data.get('proposedTime')
     examiner_id = data.get('examinerId')
     student_id = data.get('studentId')
@@ -315,91 +614,85 @@ def reschedule_exam(schedule_id):
         return jsonify({'error': 'Missing required fields: proposedTime, examinerId, studentId'}), 400
 
     try:
-        schedule = db.schedules.find_one({'_id': ObjectId(schedule_id)})
+        new_start, new_end = parse_proposed_time(proposed_time)
+        new_start, new_end = to_utc(new_start), to_utc(new_end)
+        schedule_oid = ObjectId(schedule_id)
+        examiner_oid = ObjectId(examiner_id)
+        student_oid = ObjectId(student_id)
+
+        with phase('load_schedules'):
+            nearby = list(db.schedules.find({'$or': [
+                {'_id': schedule_oid},
+                {
+                    '$or': [{'examinerId': examiner_oid}, {'studentId': student_oid}],
+                    'startTime': {'$lt': new_end},
+                    'endTime': {'$gt': new_start}
+                }
+            ]}))
+        schedule = next((s for s in nearby if s['_id'] == schedule_oid), None)
         if not schedule:
             logger.error(f'Schedule not found: {schedule_id}')
             return jsonify({'error': 'Schedule not found'}), 404
 
-        new_start, new_end = parse_proposed_time(proposed_time)
-        
-        # Fetch emails for student and examiner
-        student = db.users.find_one({'_id': ObjectId(student_id), 'role': 'Student'})
-        examiner = db.users.find_one({'_id': ObjectId(examiner_id), 'role': 'Examiner'})
-        student_email = student.get('email') if student else None
-        examiner_email = examiner.get('email') if examiner else None
-
-        existing_schedules = list(db.schedules.find({
-            '$or': [
-                {'examinerId': ObjectId(examiner_id)},
-                {'studentId': ObjectId(student_id)}
-            ]
-        }))
-
-        if has_conflict(new_start, new_end, existing_schedules, examiner_id, student_id, schedule_id):
+        with phase('conflict_check'):
+            busy_index = BusyIndex.from_schedules(nearby)
+            conflict = has_conflict(new_start, new_end, busy_index, examiner_id, student_id, schedule_id)
+        if conflict:
+            count('conflicts_hit')
             logger.error('Proposed time conflicts with existing schedules')
+            return jsonify({
+                'error': 'Proposed time conflicts with existing schedules',
+                'suggestionsUrl': f"/reschedule/{schedule_id}/suggestions?around={new_start.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+            }), 409
+
+        # Fetch emails for student and examiner
+        emails = {}
+        with phase('load_users'):
+            for user in db.users.find({'_id': {'$in': [student_oid, examiner_oid]}}, {'email': 1, 'role': 1}):
+                emails[(str(user['_id']), user.get('role'))] = user.get('email')
+        student_email = emails.get((student_id, 'Student'))
+        examiner_email = emails.get((examiner_id, 'Examiner'))
+
+        with phase('reserve'):
+            token = reserve_slot(db, schedule_oid, examiner_id, student_id, new_start, new_end)
+        if token is None:
+            count('conflicts_hit')
+            logger.error('Proposed time was taken by a concurrent reschedule')
             return jsonify({'error': 'Proposed time conflicts with existing schedules'}), 409
 
-        update_result = db.schedules.update_one(
-            {'_id': ObjectId(schedule_id)},
-            {
-                '$set': {
-                    'startTime': new_start,
-                    'endTime': new_end,
-                    'examinerId': ObjectId(examiner_id),
-                    'studentId': ObjectId(student_id),
-                    'updatedAt': datetime.now(UTC)
-                }
-            }
+        from pymongo import ReturnDocument
+
+        try:
+            with phase('update'):
+                updated_schedule = db.schedules.find_one_and_update(
+                    {'_id': schedule_oid, 'version': schedule.get('version')},
+                    {
+                        '$set': {
+                            'startTime': new_start,
+                            'endTime': new_end,
+                            'examinerId': examiner_oid,
+                            'studentId': student_oid,
+                            'reservationToken': token,
+                            'updatedAt': now()
+                        },
+                        '$inc': {'version': 1}
+                    },
+                    return_document=ReturnDocument.AFTER
+                )
+        except Exception:
+            release(db, token)
+            raise
+        if updated_schedule is None:
+            release(db, token)
+            logger.error(f'Schedule {schedule_id} was modified concurrently')
+            return jsonify({'error': 'Schedule was modified by another request, please retry'}), 409
+        release_previous(db, schedule_oid, token)
+
+        notification_summary = submit_notifications(
+            reschedule_notifications(updated_schedule, student_email, examiner_email)
         )
 
-        if update_result.modified_count == 0:
-            logger.error('Failed to update schedule')
-            return jsonify({'error': 'Failed to update schedule'}), 500
-
-        updated_schedule = db.schedules.find_one({'_id': ObjectId(schedule_id)})
-        
-        failed_emails = []
-        # Send email to student
-        if student_email:
-            subject = f"Exam Reschedule for {updated_schedule['module']}"
-            body = (
-                f"Dear Student,\n\n"
-                f"Your exam for {updated_schedule['module']} has been rescheduled.\n"
-                f"New Details:\n"
-                f"Date: {new_start.date()}\n"
-                f"Time: {new_start.strftime('%H:%M')} - {new_end.strftime('%H:%M')} UTC\n"
-                f"Examiner ID: {examiner_id}\n"
-                f"Google Meet Link: {updated_schedule.get('googleMeetLink')}\n\n"
-                f"Please ensure you are available at the new scheduled time.\n"
-                f"Best regards,\nExam Scheduling Team"
-            )
-            if not send_email(student_email, subject, body):
-                failed_emails.append({'email': student_email, 'reason': 'Failed to send student email'})
-        else:
-            logger.warning(f"No email found for student ID: {student_id}")
-            failed_emails.append({'email': student_id, 'reason': 'No email address for student'})
-
-        # Send email to examiner
-        if examiner_email:
-            subject = f"Exam Reschedule for {updated_schedule['module']}"
-            body = (
-                f"Dear Examiner,\n\n"
-                f"Your exam for {updated_schedule['module']} has been rescheduled.\n"
-                f"New Details:\n"
-                f"Student ID: {student_id}\n"
-                f"Date: {new_start.date()}\n"
-                f"Time: {new_start.strftime('%H:%M')} - {new_end.strftime('%H:%M')} UTC\n"
-                f"Google Meet Link: {updated_schedule.get('googleMeetLink')}\n\n"
-                f"Please ensure you are available at the new scheduled time.\n"
-                f"Best regards,\nExam Scheduling Team"
-            )
-            if not send_email(examiner_email, subject, body):
-                failed_emails.append({'email': examiner_email, 'reason': 'Failed to send examiner email'})
-        else:
-            logger.warning(f"No email found for examiner ID: {examiner_id}")
-            failed_emails.append({'email': examiner_id, 'reason': 'No email address for examiner'})
-
-        logger.info(f'Updated schedule: {updated_schedule}')
+        logger.debug('Updated schedule: %s', updated_schedule)
         response = {
             'message': 'Schedule updated successfully',
             'schedule': {
@@ -410,17 +703,172 @@ def reschedule_exam(schedule_id):
                 'endTime': updated_schedule['endTime'].isoformat(),
                 'module': updated_schedule['module'],
                 'googleMeetLink': updated_schedule.get('googleMeetLink')
-            }
+            },
+            'notifications': notification_summary
         }
-        if failed_emails:
-            response['failed_emails'] = failed_emails
         return jsonify(response), 200
     except Exception as e:
         logger.error(f'Error in reschedule_exam: {str(e)}')
         return jsonify({'error': str(e)}), 400
 
-if __name__ == '__main__':
+@bp.route('/reschedule/<schedule_id>/suggestions', methods=['GET'])
+def get_reschedule_suggestions(schedule_id):
+    """The k free slots nearest to a time, for moving a schedule without trial and error.
+
+    Query parameters: k (default 5), around (ISO time, default the current start),
+    examinerId (default the current examiner) and days (search horizon either side).
+    Slots come from the examiner's compiled availability for the schedule's module and
+    keep its duration; the examiner's and student's other schedules are swept out.
+    """
+    db = get_db()
+    try:
+        schedule = db.schedules.find_one(
+            {'_id': ObjectId(schedule_id)},
+            {'examinerId': 1, 'studentId': 1, 'startTime': 1, 'endTime': 1, 'module': 1}
+        )
+        if not schedule:
+            return jsonify({'error': 'Schedule not found'}), 404
+        k = min(int(request.args.get('k', 5)), MAX_SUGGESTIONS)
+        days = int(request.args.get('days', SUGGESTION_HORIZON_DAYS))
+        examiner_id = request.args.get('examinerId') or str(schedule['examinerId'])
+        student_id = str(schedule['studentId'])
+        start, end = to_utc(schedule['startTime']), to_utc(schedule['endTime'])
+        target = to_utc(request.args['around']) if request.args.get('around') else start
+        if k <= 0 or days <= 0:
+            raise ValueError('k and days must be positive')
+        examiner_oid = ObjectId(examiner_id)
+    except (InvalidId, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid request: {str(e)}'}), 400
+
+    duration = int((end - start).total_seconds() // 60)
+    # Suggestions in the past are of no use
+    window_start = max(target - timedelta(days=days), now())
+    window_end = target + timedelta(days=days)
+    if window_end <= window_start:
+        return jsonify({'scheduleId': schedule_id, 'duration': duration, 'suggestions': []}), 200
+
+    with phase('load_availability'):
+        availabilities = list(load_availabilities(db, [examiner_oid], schedule['module'], window_start, window_end))
+    with phase('load_busy'):
+        busy_index = load_busy_index(db, [examiner_oid], [schedule['studentId']], window_start, window_end)
+    with phase('suggest'):
+        starts = examiner_slot_starts(
+            availabilities, duration, to_minutes(window_start), to_minutes(window_end)
+        ).get(examiner_id, [])
+        # The schedule being moved does not block its own new time
+        busy = busy_minutes(
+            busy_index.examiners.intervals(examiner_id) + busy_index.students.intervals(student_id),
+            exclude_id=schedule_id
+        )
+        free = free_starts(starts, duration, busy)
+        if examiner_id == str(schedule['examinerId']):
+            current = to_minutes(start)
+            free = [minute for minute in free if minute != current]
+        picked = nearest(free, to_minutes(target), k)
+
+    suggestions = []
+    for minute in picked:
+        slot_start = from_minutes(minute)
+        slot_end = from_minutes(minute + duration)
+        suggestions.append({
+            # The shape PUT /reschedule accepts, which keeps durations other than 30 minutes
+            'proposedTime': {
+                'date': slot_start.date().isoformat(),
+                'startTime': slot_start.strftime('%H:%M'),
+                'endTime': slot_end.strftime('%H:%M')
+            },
+            'startTime': slot_start.isoformat(),
+            'endTime': slot_end.isoformat(),
+            'distanceMinutes': abs(minute - to_minutes(target))
+        })
+    return jsonify({
+        'scheduleId': schedule_id,
+        'examinerId': examiner_id,
+        'studentId': student_id,
+        'duration': duration,
+        'suggestions': suggestions
+    }), 200
+
+@bp.route('/notifications/<batch_id>', methods=['GET'])
+def get_notification_status(batch_id):
+    db = get_db()
+    deliveries = list(db.emaildeliveries.find(
+        {'batchId': batch_id},
+        {'to': 1, 'recipientId': 1, 'role': 1, 'scheduleId': 1, 'status': 1, 'attempts': 1, 'error': 1}
+    ))
+    if not deliveries:
+        return jsonify({'error': 'Notification batch not found'}), 404
+    counts = {}
+    for delivery in deliveries:
+        delivery['_id'] = str(delivery['_id'])
+        counts[delivery['status']] = counts.get(delivery['status'], 0) + 1
+    return jsonify({'batchId': batch_id, 'counts': counts, 'deliveries': deliveries}), 200
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Phase timings, request latencies and solver counters of this worker in the Prometheus text format."""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+def begin_request_metrics():
+    metrics.begin_request(request.endpoint, request.args.get('profile') == '1')
+
+def end_request_metrics(response):
+    if response.is_streamed:
+        # A streamed body is produced after this hook runs; finish once it has been sent
+        response.call_on_close(lambda: finish_request_metrics(response.status_code))
+    else:
+        finish_request_metrics(response.status_code)
+    return response
+
+def finish_request_metrics(status):
+    dump = metrics.end_request(status)
+    if dump:
+        logger.info(f'Request profile written to {dump}.prof')
+
+def create_indexes():
+    """Create the indexes; a failure is logged and not retried, so requests are still served."""
+    try:
+        ensure_indexes(get_db())
+        ensure_reservation_indexes(get_db())
+    except Exception as e:
+        logger.error(f'Error creating indexes: {str(e)}')
+        return False
+    return True
+
+_indexes = PerProcess(create_indexes)
+
+def ensure_indexes_once():
+    """Create the indexes on the first request of each worker process."""
+    _indexes.get()
+
+def create_app(db=None, dispatcher=None, clock=None):
+    """Build the Flask app, optionally with stand-ins for its services.
+
+    db replaces MONGO_URI (e.g. a mongomock database), dispatcher replaces the SMTP one
+    (e.g. an EmailDispatcher with a MemoryTransport) and clock, a zero-argument callable
+    returning an aware datetime, replaces the system clock. No connection is made here,
+    so the app can be created before a server forks its workers. See wsgi.py and
+    gunicorn.conf.py for the production entry point.
+    """
+    if db is not None:
+        set_db(db)
+    if dispatcher is not None:
+        set_dispatcher(dispatcher)
+    if clock is not None:
+        set_clock(clock)
+    app = Flask(__name__)
+    # Configure CORS to allow requests from the Node.js backend
+    CORS(app, resources={r"/*": {"origins": "http://localhost:5000"}})
+    app.register_blueprint(bp)
+    app.before_request(ensure_indexes_once)
+    app.before_request(begin_request_metrics)
+    app.after_request(end_request_metrics)
     # Verify email configuration at startup
-    if not all([SMTP_USERNAME, SMTP_PASSWORD, FROM_EMAIL]):
-        logger.error(f"SMTP_USERNAME, SMTP_PASSWORD, or FROM_EMAIL not set for {EMAIL_PROVIDER} in .env file")
-    app.run(debug=True, port=5001)
\ No newline at end of file
+    settings = smtp_settings()
+    if dispatcher is None and not all([settings['username'], settings['password'], settings['from_email']]):
+        logger.error(f"SMTP_USERNAME, SMTP_PASSWORD, or FROM_EMAIL not set for {settings['provider']} in .env file")
+    return app
+
+if __name__ == '__main__':
+    # Development server only; run production through gunicorn (see wsgi.py)
+    create_app().run(debug=True, port=5001)
\ No newline at end of file
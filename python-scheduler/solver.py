@@ -0,0 +1,225 @@
+from bisect import bisect_left, bisect_right
+from collections import deque
+from datetime import timedelta
+from importlib.util import find_spec
+from availability import from_minutes
+
+# The numpy backend is imported on first use, keeping numpy out of startup
+NUMPY_AVAILABLE = find_spec('numpy') is not None
+
+
+class _NextFree:
+    """Smallest index >= i that is still free, with path compression (union-find over a line)."""
+
+    def __init__(self, size):
+        self._parent = list(range(size + 1))
+
+    def find(self, i):
+        parent = self._parent
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    def take(self, i):
+        self._parent[i] = i + 1
+
+
+def solve_greedy(student_ids, slots_by_examiner, duration, busy_index, stats=None):
+    """Round-robin students over the examiners and give each the first conflict-free slot.
+
+    slots_by_examiner maps examiner ids to sorted epoch-minute slot starts and duration
+    is in minutes.
+
+    Stops at the first student that cannot be placed. Returns (placements, unplaced),
+    where unplaced holds at most that one student. Placed schedules are added to
+    busy_index as they are made. When a stats dict is given, the candidate slots tried
+    and the conflicts hit are added to its 'candidates_tried' and 'conflicts_hit' keys.
+    """
+    placements = []
+    unplaced = []
+    tried = 0
+    length = timedelta(minutes=duration)
+    available_examiners = list(slots_by_examiner.keys())
+    for examiner_index, student_id in enumerate(student_ids):
+        examiner_id = available_examiners[examiner_index % len(available_examiners)]
+        scheduled = False
+        for start_minute in slots_by_examiner[examiner_id]:
+            tried += 1
+            current_start = from_minutes(start_minute)
+            current_end = current_start + length
+            if not busy_index.has_conflict(current_start, current_end, examiner_id, student_id):
+                placements.append((student_id, examiner_id, current_start, current_end))
+                busy_index.add(examiner_id, student_id, current_start, current_end)
+                scheduled = True
+                break
+        if not scheduled:
+            unplaced = [student_id]
+            break
+    if stats is not None:
+        _add_stats(stats, tried, tried - len(placements))
+    return placements, unplaced
+
+
+def _add_stats(stats, candidates_tried, conflicts_hit):
+    stats['candidates_tried'] = stats.get('candidates_tried', 0) + candidates_tried
+    stats['conflicts_hit'] = stats.get('conflicts_hit', 0) + conflicts_hit
+
+
+def greedy_solver(backend):
+    """solve_greedy, or its NumPy implementation for backend 'numpy'."""
+    if backend == 'numpy':
+        from vector_backend import solve_greedy_vectorized
+
+        return solve_greedy_vectorized
+    return solve_greedy
+
+
+def examiner_candidates(slots_by_examiner, duration, busy_index, stats=None):
+    """Turn each examiner's slot starts into (start, end) datetime candidates.
+
+    Candidates are sorted by start, never overlap each other and never overlap the
+    examiner's existing schedules, so any set of them can be used at the same time.
+    """
+    candidates = {}
+    tried = clashes = 0
+    length = timedelta(minutes=duration)
+    for examiner_id, starts in slots_by_examiner.items():
+        tried += len(starts)
+        kept = []
+        last_end = None
+        for start_minute in starts:
+            start = from_minutes(start_minute)
+            end = start + length
+            if last_end is not None and start < last_end:
+                continue
+            if busy_index.examiners.overlaps(examiner_id, start, end):
+                clashes += 1
+                continue
+            kept.append((start, end))
+            last_end = end
+        if kept:
+            candidates[examiner_id] = kept
+    if stats is not None:
+        _add_stats(stats, tried, clashes)
+    return candidates
+
+
+def _slot_order(candidates):
+    """Interleave the examiners' candidates by rank so the earliest slots of every examiner come first."""
+    order = []
+    examiner_order = {examiner_id: i for i, examiner_id in enumerate(candidates)}
+    for examiner_id, slots in candidates.items():
+        for rank, (start, end) in enumerate(slots):
+            order.append((rank, start, examiner_order[examiner_id], examiner_id, end))
+    order.sort()
+    return [(examiner_id, start, end) for _, start, _, examiner_id, end in order]
+
+
+def _student_conflicts(student_id, slots, slot_starts, by_start, duration, busy_index):
+    """Indexes of the slots that overlap one of the student's busy intervals."""
+    conflicts = set()
+    for busy_start, busy_end, _ in busy_index.students.intervals(student_id):
+        lo = bisect_right(slot_starts, busy_start - duration)
+        hi = bisect_left(slot_starts, busy_end)
+        for pos in range(lo, hi):
+            slot = by_start[pos]
+            if slots[slot][1] < busy_end and slots[slot][2] > busy_start:
+                conflicts.add(slot)
+    return conflicts
+
+
+def solve_optimal(student_ids, slots_by_examiner, duration, busy_index, stats=None):
+    """Place as many students as possible, one candidate slot each.
+
+    Solves the student x (examiner, slot) bipartite matching with Kuhn's augmenting
+    paths. A student can take any slot except the few that clash with their own
+    schedules, so the graph is stored as conflict sets and the next usable slot is
+    found with a union-find over the slot order. Slots are ordered round-robin across
+    examiners and earliest first, which keeps examiner load balanced and slots packed.
+
+    Returns (placements, unplaced), where placements are (student_id, examiner_id,
+    start, end) tuples in student order. stats is filled in as for solve_greedy, with
+    every (student, slot) clash counted as a conflict.
+    """
+    candidates = examiner_candidates(slots_by_examiner, duration, busy_index, stats)
+    duration = timedelta(minutes=duration)
+    slots = _slot_order(candidates)
+    size = len(slots)
+    by_start = sorted(range(size), key=lambda i: slots[i][1])
+    slot_starts = [slots[i][1] for i in by_start]
+
+    conflicts = {}
+    for student_id in student_ids:
+        if busy_index.students.intervals(student_id):
+            student_conflicts = _student_conflicts(student_id, slots, slot_starts, by_start, duration, busy_index)
+            if student_conflicts:
+                conflicts[student_id] = student_conflicts
+    if stats is not None:
+        _add_stats(stats, 0, sum(len(blocked) for blocked in conflicts.values()))
+
+    owner = [None] * size
+    assigned = {}
+    unused = _NextFree(size)
+    no_conflicts = frozenset()
+
+    def first_unused(blocked):
+        i = unused.find(0)
+        while i < size and i in blocked:
+            i = unused.find(i + 1)
+        return i
+
+    def augment(student_id):
+        """Breadth-first search for an augmenting path that frees a slot for student_id."""
+        unvisited = _NextFree(size)
+        parent = {}
+        queue = deque([student_id])
+        while queue:
+            current = queue.popleft()
+            blocked = conflicts.get(current, no_conflicts)
+            i = unvisited.find(0)
+            while i < size:
+                if i not in blocked:
+                    unvisited.take(i)
+                    parent[i] = current
+                    if owner[i] is None:
+                        # Walk back along the path, shifting every student one slot.
+                        slot = i
+                        while slot is not None:
+                            moving = parent[slot]
+                            previous = assigned.get(moving)
+                            owner[slot] = moving
+                            assigned[moving] = slot
+                            slot = previous if moving != student_id else None
+                        unused.take(i)
+                        return True
+                    queue.append(owner[i])
+                i = unvisited.find(i + 1)
+        return False
+
+    # Students with clashes go first; the rest can take any slot that is left over.
+    ordered = sorted(student_ids, key=lambda sid: -len(conflicts.get(sid, no_conflicts)))
+    for student_id in ordered:
+        if student_id in assigned:
+            continue
+        blocked = conflicts.get(student_id, no_conflicts)
+        i = first_unused(blocked)
+        if i < size:
+            owner[i] = student_id
+            assigned[student_id] = i
+            unused.take(i)
+        elif blocked and unused.find(0) < size:
+            augment(student_id)
+
+    placements = []
+    unplaced = []
+    for student_id in dict.fromkeys(student_ids):
+        slot = assigned.get(student_id)
+        if slot is None:
+            unplaced.append(student_id)
+        else:
+            examiner_id, start, end = slots[slot]
+            placements.append((student_id, examiner_id, start, end))
+    return placements, unplaced
@@ -0,0 +1,54 @@
+from bisect import bisect_left
+from availability import EPOCH
+
+
+def busy_minutes(intervals, exclude_id=None):
+    """Merge (start, end, schedule_id) intervals into sorted, disjoint epoch-minute ranges.
+
+    Bounds are rounded outwards, so a slot clear of every range is clear of the intervals.
+    """
+    ranges = []
+    for start, end, schedule_id in intervals:
+        if exclude_id is not None and schedule_id == exclude_id:
+            continue
+        ranges.append((
+            int((start - EPOCH).total_seconds() // 60),
+            -int(-(end - EPOCH).total_seconds() // 60)
+        ))
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def free_starts(starts, duration, busy):
+    """Sweep the sorted slot starts against the merged busy ranges; returns the starts that fit."""
+    free = []
+    i = 0
+    for start in starts:
+        # Ranges ending at or before this start can never clash with a later one either
+        while i < len(busy) and busy[i][1] <= start:
+            i += 1
+        if i == len(busy) or busy[i][0] >= start + duration:
+            free.append(start)
+    return free
+
+
+def nearest(free, target, k):
+    """The k free starts closest to target (ties go to the earlier one), in order of distance."""
+    right = bisect_left(free, target)
+    left = right - 1
+    picked = []
+    while len(picked) < k and (left >= 0 or right < len(free)):
+        if right >= len(free) or (left >= 0 and target - free[left] <= free[right] - target):
+            picked.append(free[left])
+            left -= 1
+        else:
+            picked.append(free[right])
+            right += 1
+    return picked
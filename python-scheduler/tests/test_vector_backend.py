@@ -0,0 +1,134 @@
+"""The NumPy greedy backend must place students exactly as solver.solve_greedy does.
+
+    python -m pytest tests
+"""
+import os
+import random
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pytz import UTC
+
+import availability
+from availability import examiner_slot_starts, to_minutes
+from interval_index import BusyIndex
+from solver import NUMPY_AVAILABLE, solve_greedy
+
+DAY = datetime(2026, 11, 2, tzinfo=UTC)
+CASES = 300
+
+
+def clock(minutes):
+    hour, minute = divmod(minutes, 60)
+    return f"{hour % 12 or 12}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+def availability_docs(rng, examiners, days):
+    """One to three documents per examiner and day; windows of the same day often overlap,
+    and their starts are not aligned, so the merged slot starts interleave."""
+    docs = []
+    for examiner_id in examiners:
+        for day in range(days):
+            for _ in range(rng.randint(1, 3)):
+                start = rng.randrange(8 * 60, 15 * 60, 5)
+                end = start + rng.randrange(15, 4 * 60, 5)
+                docs.append({
+                    '_id': f'{examiner_id}-{len(docs)}',
+                    'examinerId': examiner_id,
+                    'module': 'IT1010',
+                    'date': DAY + timedelta(days=day),
+                    'availableSlots': [f'{clock(start)}-{clock(end)}']
+                })
+    return docs
+
+
+def existing_schedules(rng, examiners, students, days, count):
+    """Random busy time, including zero-length intervals and times outside the windows."""
+    schedules = []
+    for _ in range(count):
+        start = DAY + timedelta(days=rng.randrange(days), minutes=rng.randrange(7 * 60, 17 * 60))
+        length = rng.choice([0, 0, 5, 30, 45, 90])
+        schedules.append({
+            'examinerId': rng.choice(examiners + ['other-examiner']),
+            'studentId': rng.choice(students + ['other-student']),
+            'startTime': start,
+            'endTime': start + timedelta(minutes=length)
+        })
+    return schedules
+
+
+def random_case(rng, repeated_students=False):
+    examiners = [f'e{i}' for i in range(rng.randint(1, 4))]
+    students = [f's{i}' for i in range(rng.randint(1, 40))]
+    if repeated_students:
+        students += rng.sample(students, rng.randint(1, len(students)))
+        rng.shuffle(students)
+    days = rng.randint(1, 3)
+    duration = rng.choice([15, 20, 30, 45])
+    docs = availability_docs(rng, examiners, days)
+    schedules = existing_schedules(rng, examiners, students, days, rng.randint(0, 30))
+    window_start = to_minutes(DAY)
+    window_end = to_minutes(DAY + timedelta(days=days))
+    slots_by_examiner = examiner_slot_starts(docs, duration, window_start, window_end)
+    return students, slots_by_examiner, duration, schedules
+
+
+@unittest.skipUnless(NUMPY_AVAILABLE, 'numpy is not installed')
+class VectorBackendTest(unittest.TestCase):
+
+    def setUp(self):
+        availability.cache.clear()
+
+    def assert_same_schedules(self, students, slots_by_examiner, duration, schedules):
+        from vector_backend import solve_greedy_vectorized
+
+        if not slots_by_examiner:
+            return
+        expected_index = BusyIndex.from_schedules(schedules)
+        actual_index = BusyIndex.from_schedules(schedules)
+        expected = solve_greedy(list(students), slots_by_examiner, duration, expected_index)
+        actual = solve_greedy_vectorized(list(students), slots_by_examiner, duration, actual_index)
+        self.assertEqual(actual, expected)
+        for examiner_id in slots_by_examiner:
+            self.assertEqual(
+                actual_index.examiners.intervals(examiner_id), expected_index.examiners.intervals(examiner_id)
+            )
+
+    def test_random_inputs(self):
+        rng = random.Random(5)
+        for case in range(CASES):
+            with self.subTest(case=case):
+                self.assert_same_schedules(*random_case(rng))
+
+    def test_repeated_students(self):
+        rng = random.Random(55)
+        for case in range(CASES // 3):
+            with self.subTest(case=case):
+                self.assert_same_schedules(*random_case(rng, repeated_students=True))
+
+    def test_overlapping_documents(self):
+        # 9:00-10:00 and 9:15-10:15 merge into starts 9:00, 9:15, 9:30, 9:45 for 30 minutes
+        docs = [
+            {'_id': 'a', 'examinerId': 'e0', 'module': 'IT1010', 'date': DAY, 'availableSlots': ['9:00 AM-10:00 AM']},
+            {'_id': 'b', 'examinerId': 'e0', 'module': 'IT1010', 'date': DAY, 'availableSlots': ['9:15 AM-10:15 AM']}
+        ]
+        slots_by_examiner = examiner_slot_starts(docs, 30, to_minutes(DAY), to_minutes(DAY + timedelta(days=1)))
+        self.assertEqual(len(slots_by_examiner['e0']), 4)
+        self.assert_same_schedules(['s0', 's1', 's2'], slots_by_examiner, 30, [])
+
+    def test_zero_length_busy_intervals(self):
+        slots_by_examiner = {'e0': [to_minutes(DAY) + 9 * 60 + 30 * i for i in range(4)]}
+        schedules = [
+            {'examinerId': 'e0', 'studentId': 'x', 'startTime': DAY + timedelta(hours=9, minutes=30),
+             'endTime': DAY + timedelta(hours=9, minutes=30)},
+            {'examinerId': 'y', 'studentId': 's1', 'startTime': DAY + timedelta(hours=9, minutes=10),
+             'endTime': DAY + timedelta(hours=9, minutes=10)}
+        ]
+        self.assert_same_schedules(['s0', 's1', 's2'], slots_by_examiner, 30, schedules)
+
+
+if __name__ == '__main__':
+    unittest.main()
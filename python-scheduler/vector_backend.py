@@ -0,0 +1,142 @@
+import numpy as np
+from availability import EPOCH, from_minutes
+from solver import solve_greedy
+
+# Candidates are scanned in chunks so students with clashes only pay for the slots they look at.
+CHUNK = 256
+
+
+def _busy_minutes(intervals):
+    """Exact (start, end) bounds of busy intervals as float epoch minutes."""
+    if not intervals:
+        return None, None
+    starts = np.array([(start - EPOCH).total_seconds() / 60 for start, _, _ in intervals])
+    ends = np.array([(end - EPOCH).total_seconds() / 60 for _, end, _ in intervals])
+    return starts, ends
+
+
+def _occupancy(intervals, origin, length):
+    """Boolean minute timeline of [origin, origin + length) with every busy minute set."""
+    timeline = np.zeros(length, dtype=bool)
+    busy_starts, busy_ends = _busy_minutes(intervals)
+    if busy_starts is not None:
+        lo = np.clip(np.floor(busy_starts).astype(np.int64) - origin, 0, length)
+        hi = np.clip(np.ceil(busy_ends).astype(np.int64) - origin, 0, length)
+        for a, b in zip(lo, hi):
+            timeline[a:b] = True
+    return timeline
+
+
+def _place_examiner(starts, duration, timeline, origin, students, busy_index):
+    """Greedy first fit of students (in order) onto one examiner's candidate starts.
+
+    Returns (placements, failed_position) where placements are (position, start minute)
+    pairs and failed_position is the position in students that could not be placed.
+    """
+    count = len(starts)
+    # Rolling sum of busy minutes over each duration-long window.
+    prefix = np.concatenate(([0], np.cumsum(timeline, dtype=np.int64)))
+    offsets = starts - origin
+    free = (prefix[offsets + duration] - prefix[offsets]) == 0
+    disjoint = count < 2 or bool(np.all(np.diff(starts) >= duration))
+
+    def first_fit(lo, busy_starts, busy_ends):
+        pos = lo
+        while pos < count:
+            hi = min(pos + CHUNK, count)
+            ok = free[pos:hi]
+            if busy_starts is not None:
+                chunk = starts[pos:hi]
+                clash = (busy_starts[:, None] < chunk + duration) & (busy_ends[:, None] > chunk)
+                ok = ok & ~clash.any(axis=0)
+            hits = np.flatnonzero(ok)
+            if hits.size:
+                return pos + int(hits[0])
+            pos = hi
+        return -1
+
+    def take(index):
+        if disjoint:
+            free[index] = False
+        else:
+            start = starts[index]
+            lo = np.searchsorted(starts, start - duration, side='right')
+            hi = np.searchsorted(starts, start + duration, side='left')
+            free[lo:hi] = False
+
+    placements = []
+    head = 0
+    position = 0
+    while position < len(students):
+        busy_starts, busy_ends = _busy_minutes(busy_index.students.intervals(students[position]))
+        if busy_starts is None and disjoint:
+            # A run of students without clashes takes the next free candidates in one batch.
+            run = position
+            while run < len(students) and not busy_index.students.intervals(students[run]):
+                run += 1
+            hits = np.flatnonzero(free[head:])[:run - position]
+            taken = head + hits
+            free[taken] = False
+            placements.extend(zip(range(position, position + len(taken)), taken.tolist()))
+            position += len(taken)
+            if position < run:
+                return placements, position
+            if taken.size:
+                head = int(taken[-1]) + 1
+            continue
+        index = first_fit(head, busy_starts, busy_ends)
+        if index < 0:
+            return placements, position
+        take(index)
+        placements.append((position, index))
+        if index == head:
+            head = first_fit(head, None, None)
+            if head < 0:
+                head = count
+        position += 1
+    return placements, None
+
+
+def solve_greedy_vectorized(student_ids, slots_by_examiner, duration, busy_index, stats=None):
+    """NumPy implementation of solver.solve_greedy that returns identical schedules.
+
+    Each examiner's share of the round robin is independent of the others, so the
+    examiners are placed one at a time: their existing schedules become a boolean
+    minute timeline, free duration-long windows come from a rolling sum over it, and
+    runs of students without clashes are placed as a batch. Candidates are not tried
+    one at a time here, so stats is only filled in on the fallback path.
+    """
+    if len(set(student_ids)) != len(student_ids):
+        # Repeated students clash across examiners; only the reference path handles that order.
+        return solve_greedy(student_ids, slots_by_examiner, duration, busy_index, stats)
+
+    available_examiners = list(slots_by_examiner.keys())
+    arrays = {examiner_id: np.asarray(slots_by_examiner[examiner_id], dtype=np.int64)
+              for examiner_id in available_examiners}
+    non_empty = [starts for starts in arrays.values() if len(starts)]
+    origin = min(int(starts[0]) for starts in non_empty) if non_empty else 0
+    length = max(int(starts[-1]) for starts in non_empty) + duration - origin if non_empty else 0
+
+    by_position = {}
+    first_failure = len(student_ids)
+    for k, examiner_id in enumerate(available_examiners):
+        students = student_ids[k::len(available_examiners)]
+        if not students:
+            continue
+        starts = arrays[examiner_id]
+        timeline = _occupancy(busy_index.examiners.intervals(examiner_id), origin, length)
+        placements, failed = _place_examiner(starts, duration, timeline, origin, students, busy_index)
+        for position, index in placements:
+            by_position[k + position * len(available_examiners)] = (examiner_id, int(starts[index]))
+        if failed is not None:
+            first_failure = min(first_failure, k + failed * len(available_examiners))
+
+    results = []
+    for student_index in range(first_failure):
+        examiner_id, start_minute = by_position[student_index]
+        start = from_minutes(start_minute)
+        end = from_minutes(start_minute + duration)
+        busy_index.add(examiner_id, student_ids[student_index], start, end)
+        results.append((student_ids[student_index], examiner_id, start, end))
+    unplaced = [student_ids[first_failure]] if first_failure < len(student_ids) else []
+    return results, unplaced
@@ -0,0 +1,59 @@
+from loaders import event_id_values
+from resources import now
+
+
+def load_watermark(db, event_id):
+    """The event's incremental scheduling state, empty before its first run.
+
+    registeredAt is the watermark: registrations before it have been considered. nextNumber
+    is the next free Meet link number.
+    """
+    return db.eventwatermarks.find_one({'_id': str(event_id)}) or {}
+
+
+def advance_watermark(db, event_id, latest, first_unplaced=None):
+    """Record that registrations up to latest have been considered.
+
+    With students left unplaced, the watermark only moves back to the earliest of their
+    registrations (first_unplaced), so the next run reads them again.
+    """
+    if first_unplaced is not None:
+        update = {'$min': {'registeredAt': first_unplaced}}
+    elif latest is not None:
+        update = {'$max': {'registeredAt': latest}}
+    else:
+        return
+    update['$set'] = {'updatedAt': now()}
+    db.eventwatermarks.update_one({'_id': str(event_id)}, update, upsert=True)
+
+
+def reserve_numbers(db, event_id, count):
+    """Reserve count consecutive Meet link numbers for the event; returns the first.
+
+    The event's schedules are only counted on its first incremental run; after that the
+    numbers come from an atomic counter, so concurrent runs never share one.
+    """
+    from pymongo import ReturnDocument
+    from pymongo.errors import DuplicateKeyError
+
+    key = str(event_id)
+    for attempt in range(2):
+        counter = db.eventwatermarks.find_one_and_update(
+            {'_id': key, 'nextNumber': {'$exists': True}},
+            {'$inc': {'nextNumber': count}},
+            return_document=ReturnDocument.BEFORE
+        )
+        if counter is not None:
+            return counter['nextNumber']
+        first = db.schedules.count_documents({'eventId': {'$in': event_id_values(event_id)}}) + 1
+        try:
+            db.eventwatermarks.update_one(
+                {'_id': key, 'nextNumber': {'$exists': False}},
+                {'$set': {'nextNumber': first + count}},
+                upsert=True
+            )
+            return first
+        except DuplicateKeyError:
+            # A concurrent run started the counter first; take numbers from it
+            continue
+    raise RuntimeError(f'Could not reserve Meet link numbers for event {event_id}')
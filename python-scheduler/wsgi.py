@@ -0,0 +1,11 @@
+"""Production entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+    uvicorn --interface wsgi --workers 4 --port 5001 wsgi:app
+
+The MongoClient is created lazily in each worker after the fork, so the app can
+be preloaded in the master process.
+"""
+from scheduler import create_app
+
+app = create_app()